@@ -0,0 +1,102 @@
+"""
+Microbenchmarks for `Headers` and `SignatureHeader`, compared with the
+implementation they replaced (a list scan and a split/regex per field).
+
+Run with:
+$ python benchmarks/bench_headers.py
+"""
+
+import os
+import re
+import sys
+import timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+
+from activity_tools.headers import Headers, SignatureHeader
+
+SIGNATURE = (
+    'keyId="https://mastodon.example/users/alice#main-key",'
+    'algorithm="rsa-sha256",'
+    'headers="(request-target) host date digest content-type",'
+    'signature="' + "A" * 342 + '=="'
+)
+
+HEADERS = [
+    ("Host", "example.com"),
+    ("User-Agent", "http.rb/5.1.1 (Mastodon/4.1.0; +https://mastodon.example/)"),
+    ("Content-Length", "2351"),
+    ("Accept-Encoding", "gzip"),
+    ("Content-Type", "application/activity+json"),
+    ("Date", "Sat, 18 Oct 2026 10:00:00 GMT"),
+    ("Digest", "SHA-256=frcCZrdyjLbGOdOoEsk2bqXcoBqNOAymTgpvlLu9GDk="),
+    ("Signature", SIGNATURE),
+    ("X-Forwarded-For", "10.0.0.1"),
+    ("X-Forwarded-Proto", "https"),
+]
+
+SIGNED = ["host", "date", "digest", "content-type"]
+
+class OldSignatureHeader:
+
+    def __init__(self, header) -> None:
+        for sh in header.split(","):
+            m = re.match(r'^"?([^"]+)"?="?([^"]+)"?$', sh)
+            key = m.group(1)
+            value = m.group(2)
+
+            if key.lower() == "keyid":
+                self.key_id = value
+            elif key.lower() == "algorithm":
+                self.algorithm = value
+            elif key.lower() == "headers":
+                self.headers = value.split(" ")
+            elif key.lower() == "signature":
+                self.signature = value
+            else:
+                raise Exception("Unsupported SignatureHeader key")
+
+class OldHeader:
+
+    def __init__(self, header) -> None:
+        self.name = header[0]
+        self.raw_value = header[1]
+
+        if self.name.lower() == "signature":
+            self._parsed_value = OldSignatureHeader(self.raw_value)
+        else:
+            self._parsed_value = self.raw_value
+
+class OldHeaders:
+
+    def __init__(self, headers) -> None:
+        self.headers = []
+
+        for header in headers:
+            self.headers.append(OldHeader(header))
+
+    def get(self, name):
+        for header in self.headers:
+            if header.name.lower() == name:
+                return header
+
+def old_lookup():
+    headers = OldHeaders(HEADERS)
+    headers.get("signature")
+    for name in SIGNED:
+        headers.get(name)
+
+def new_lookup():
+    headers = Headers(HEADERS)
+    headers.get("signature").value
+    for name in SIGNED:
+        headers.get(name)
+
+def report(name, old, new, number):
+    old_time = min(timeit.repeat(old, number=number, repeat=5)) / number
+    new_time = min(timeit.repeat(new, number=number, repeat=5)) / number
+    print(f"{name:<24} old {old_time * 1e6:8.2f} us   new {new_time * 1e6:8.2f} us   {old_time / new_time:5.2f}x")
+
+if __name__ == "__main__":
+    report("SignatureHeader", lambda: OldSignatureHeader(SIGNATURE), lambda: SignatureHeader(SIGNATURE), 20000)
+    report("Headers + lookups", old_lookup, new_lookup, 20000)
@@ -0,0 +1,151 @@
+"""
+A local stand-in for a remote ActivityPub server, used by the benchmarks so
+they do not need network access. It serves actor and key documents for any
+username, and accepts POSTs to inboxes.
+"""
+
+import json
+import threading
+from urllib.parse import urlparse, parse_qs
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+class FakeFederationServer:
+    """
+    Serves `/users/{username}`, `/users/{username}/key`, WebFinger for
+    `acct:{username}@{host}` and accepts POSTs to
+    `/users/{username}/inbox` on a random local port. All actors share the
+    public key `public_key_pem`, and the Ed25519 Multikey
+    `public_key_multibase` if it is given.
+
+    ```python
+    Example:
+        with FakeFederationServer(key.public_key.decode()) as server:
+            actor_url = server.actor_url("alice")
+    ```
+    """
+
+    def __init__(self, public_key_pem: str, public_key_multibase: str = None) -> None:
+        self.public_key_pem = public_key_pem
+        self.public_key_multibase = public_key_multibase
+        self.requests = 0
+        self.posts = 0
+
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            # Headers and body are written separately, without this Nagle's
+            # algorithm delays each response on a kept alive connection
+            disable_nagle_algorithm = True
+
+            def do_GET(self):
+                server.requests += 1
+                url = urlparse(self.path)
+                parts = url.path.strip("/").split("/")
+
+                if url.path == "/.well-known/webfinger":
+                    resource = parse_qs(url.query).get("resource", [""])[0]
+                    self._send(200, server.webfinger_document(resource))
+                elif len(parts) == 2 and parts[0] == "users":
+                    self._send(200, server.actor_document(parts[1]))
+                elif len(parts) == 3 and parts[0] == "users" and parts[2] == "key":
+                    self._send(200, server.key_document(parts[1]))
+                else:
+                    self._send(404, { "error": "Not found" })
+
+            def do_POST(self):
+                server.posts += 1
+                self.rfile.read(int(self.headers.get("Content-Length", 0)))
+                self._send(202, {})
+
+            def _send(self, status, document):
+                body = json.dumps(document).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/activity+json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        self.httpd = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.base_url = f"http://127.0.0.1:{self.httpd.server_port}"
+        self._thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+
+    def actor_url(self, username: str) -> str:
+        return f"{self.base_url}/users/{username}"
+
+    def key_id(self, username: str) -> str:
+        return f"{self.actor_url(username)}#main-key"
+
+    def ed25519_key_id(self, username: str) -> str:
+        return f"{self.actor_url(username)}#ed25519-key"
+
+    def actor_document(self, username: str) -> dict:
+        actor_url = self.actor_url(username)
+        document = {
+            "@context": [
+                "https://www.w3.org/ns/activitystreams",
+                "https://w3id.org/security/v1",
+            ],
+            "id": actor_url,
+            "type": "Person",
+            "inbox": f"{actor_url}/inbox",
+            "outbox": f"{actor_url}/outbox",
+            "followers": f"{actor_url}/followers",
+            "following": f"{actor_url}/following",
+            "preferredUsername": username,
+            "name": username.capitalize(),
+            "summary": "",
+            "endpoints": { "sharedInbox": f"{self.base_url}/inbox" },
+            "publicKey": {
+                "id": self.key_id(username),
+                "owner": actor_url,
+                "publicKeyPem": self.public_key_pem,
+            },
+        }
+
+        if self.public_key_multibase:
+            document["assertionMethod"] = [{
+                "id": self.ed25519_key_id(username),
+                "type": "Multikey",
+                "controller": actor_url,
+                "publicKeyMultibase": self.public_key_multibase,
+            }]
+
+        return document
+
+    def webfinger_document(self, resource: str) -> dict:
+        username = resource.removeprefix("acct:").split("@")[0]
+        return {
+            "subject": resource,
+            "links": [{
+                "rel": "self",
+                "type": "application/activity+json",
+                "href": self.actor_url(username),
+            }],
+        }
+
+    def key_document(self, username: str) -> dict:
+        return {
+            "@context": "https://www.w3.org/ns/activitystreams",
+            "id": f"{self.actor_url(username)}/key",
+            "owner": self.actor_url(username),
+            "publicKeyPem": self.public_key_pem,
+        }
+
+    def start(self) -> None:
+        self._thread.start()
+
+    def stop(self) -> None:
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.stop()
@@ -0,0 +1,70 @@
+"""
+Minimal benchmark harness. Each benchmark is timed call by call, and
+reported as ops/sec with p50 and p99 latencies. Results can be saved as a
+baseline and compared with a later run.
+"""
+
+import gc
+import json
+import time
+
+def bench(name: str, fn, min_time: float = 1.0, min_calls: int = 20, warmup: int = 5) -> dict:
+    """
+    Call `fn` repeatedly for at least `min_time` seconds and `min_calls`
+    calls. Returns a dict with ops/sec and p50/p99 latencies in microseconds.
+    """
+    for _ in range(warmup):
+        fn()
+
+    timings = []
+    gc.collect()
+    started = time.perf_counter()
+
+    while len(timings) < min_calls or time.perf_counter() - started < min_time:
+        t0 = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - t0)
+
+    timings.sort()
+    total = sum(timings)
+
+    return {
+        "name": name,
+        "calls": len(timings),
+        "ops_per_sec": len(timings) / total,
+        "p50_us": timings[len(timings) // 2] * 1e6,
+        "p99_us": timings[min(len(timings) - 1, int(len(timings) * 0.99))] * 1e6,
+    }
+
+def print_results(results: list, baseline: dict = None, threshold: float = 0.1) -> int:
+    """
+    Print a table of results. With a `baseline`, the change in ops/sec is
+    shown and benchmarks that are more than `threshold` slower are marked.
+    Returns the number of regressions.
+    """
+    regressions = 0
+    print(f"{'benchmark':<28} {'ops/sec':>12} {'p50 us':>10} {'p99 us':>10} {'change':>9}")
+
+    for result in results:
+        change = ""
+        old = (baseline or {}).get(result["name"])
+
+        if old:
+            ratio = result["ops_per_sec"] / old["ops_per_sec"] - 1
+            change = f"{ratio * 100:+8.1f}%"
+            if ratio < -threshold:
+                change += " REGRESSION"
+                regressions += 1
+
+        print(f"{result['name']:<28} {result['ops_per_sec']:>12.1f} {result['p50_us']:>10.1f} {result['p99_us']:>10.1f} {change:>9}")
+
+    return regressions
+
+def save_baseline(path: str, results: list, version: str) -> None:
+    with open(path, "w") as f:
+        json.dump({ "version": version, "results": { r["name"]: r for r in results } }, f, indent=2)
+        f.write("\n")
+
+def load_baseline(path: str) -> dict:
+    with open(path) as f:
+        return json.load(f)["results"]
@@ -0,0 +1,70 @@
+"""
+Checks that importing activity-tools stays cheap. Each module is imported in
+a fresh interpreter, and the check fails if it takes longer than its budget
+or loads one of the heavy dependencies, those should only be imported on
+first use. Use `python -X importtime` to find out what a slow import loads.
+
+Run with:
+$ python benchmarks/import_time.py
+"""
+
+import os
+import sys
+import subprocess
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+SRC = os.path.join(HERE, "..", "src")
+
+BUDGETS_MS = {
+    "activity_tools.misc": 5,
+    "activity_tools.objects": 25,
+    "activity_tools.inbox": 40,
+    "activity_tools.crypto": 5,
+    "activity_tools.headers": 50,
+}
+""" Import time budgets in milliseconds, including the standard library modules they pull in """
+
+HEAVY = ("requests", "cryptography", "multiprocessing", "asyncio")
+""" Packages that must not be loaded by importing activity-tools """
+
+RUNS = 5
+
+def import_time(module: str) -> tuple:
+    """
+    Import `module` in a new interpreter. Returns the import time in
+    milliseconds, and the heavy packages that got loaded.
+    """
+    code = (
+        f"import sys, time; sys.path.insert(0, {SRC!r}); "
+        f"t = time.perf_counter(); import {module}; t = time.perf_counter() - t; "
+        f"print(t * 1000); print(','.join(m for m in {HEAVY!r} if m in sys.modules))"
+    )
+    result = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True)
+    ms, loaded = result.stdout.split("\n")[:2]
+
+    return float(ms), [m for m in loaded.split(",") if m]
+
+def main() -> int:
+    failures = 0
+    print(f"{'module':<28} {'ms':>8} {'budget':>8}")
+
+    for module, budget in BUDGETS_MS.items():
+        # The best of a few runs, to keep a busy machine from failing the check
+        runs = [import_time(module) for _ in range(RUNS)]
+        ms = min(run[0] for run in runs)
+        loaded = runs[0][1]
+
+        status = ""
+        if ms > budget:
+            status = "OVER BUDGET"
+        if loaded:
+            status = f"loads {', '.join(loaded)}"
+        if status:
+            failures += 1
+
+        print(f"{module:<28} {ms:>8.1f} {budget:>8} {status}")
+
+    return 1 if failures else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,91 @@
+"""
+Measures the memory held per object for the types that are created in large
+numbers, or kept in caches, using tracemalloc.
+
+Run with:
+$ python benchmarks/memory.py
+"""
+
+import gc
+import os
+import sys
+import tracemalloc
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(HERE, "..", "src"))
+sys.path.insert(0, HERE)
+
+from activity_tools.crypto import RSAKey
+from activity_tools.headers import Header, Headers, SignatureHeader
+from activity_tools.misc import ImageAsset, PublicKey, WebFinger
+from activity_tools.objects import Actor, Follow
+
+from fake_server import FakeFederationServer
+from bench_headers import HEADERS, SIGNATURE
+
+def per_object(factory, count: int) -> float:
+    """
+    Create `count` objects with `factory` and return the number of bytes
+    allocated per object that are still held.
+    """
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+
+    objects = [factory(i) for i in range(count)]
+
+    gc.collect()
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+
+    del objects
+    return (after - before) / count
+
+def main() -> None:
+    key = RSAKey("/tmp/key.pem")
+    public_key = key.public_key.decode()
+
+    follow = {
+        "@context": "https://www.w3.org/ns/activitystreams",
+        "id": "https://example.com/follows/1",
+        "type": "Follow",
+        "actor": "https://example.com/users/alice",
+        "object": "https://example.com/users/bob",
+    }
+
+    def created_actor(i):
+        actor = Actor()
+        actor.create("example.com", f"user{i}", key.public_key)
+        return actor
+
+    def parsed_header(i):
+        header = Header(("Signature", SIGNATURE))
+        header.value
+        return header
+
+    with FakeFederationServer(public_key) as server:
+        def fetched_actor(i):
+            actor = Actor()
+            actor._fetch(server.actor_url(f"user{i}"))
+            return actor
+
+        benchmarks = [
+            ("Header", lambda i: Header(("Host", "example.com")), 100000),
+            ("Header (signature, parsed)", parsed_header, 20000),
+            ("SignatureHeader", lambda i: SignatureHeader(SIGNATURE), 20000),
+            ("Headers", lambda i: Headers(HEADERS), 20000),
+            ("Follow", lambda i: Follow(follow), 100000),
+            ("ImageAsset", lambda i: ImageAsset("https://example.com/a.png"), 100000),
+            ("PublicKey", lambda i: PublicKey("example.com", "alice", public_key), 100000),
+            ("WebFinger", lambda i: WebFinger("example.com", "acct:alice@example.com"), 100000),
+            ("Actor (created)", created_actor, 20000),
+            ("Actor (fetched)", fetched_actor, 1000),
+        ]
+
+        print(f"{'object':<28} {'bytes':>10}")
+
+        for name, factory, count in benchmarks:
+            print(f"{name:<28} {per_object(factory, count):>10.0f}")
+
+if __name__ == "__main__":
+    main()
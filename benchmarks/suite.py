@@ -0,0 +1,150 @@
+"""
+Benchmarks of the hot paths in activity-tools. Remote actors and keys are
+served by a local fake server, no network access is needed.
+
+Run with:
+$ python benchmarks/suite.py
+$ python benchmarks/suite.py --save                      # baselines/<version>.json
+$ python benchmarks/suite.py --compare benchmarks/baselines/0.0.7.json
+"""
+
+import os
+import re
+import sys
+import argparse
+import itertools
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(HERE, "..", "src"))
+sys.path.insert(0, HERE)
+
+from activity_tools import codec
+from activity_tools.crypto import RSAKey, Ed25519Key, multibase_public_key
+from activity_tools.headers import (
+    Headers, SignatureHeader, Signer, verify_signature, verify_request, make_signature
+)
+from activity_tools.inbox import Inbox
+from activity_tools.keys import key_store
+from activity_tools.objects import Actor, actor_cache, fetch_document
+from activity_tools.resolver import WebFingerResolver
+
+from fake_server import FakeFederationServer
+from harness import bench, print_results, save_baseline, load_baseline
+from bench_headers import HEADERS, SIGNATURE, SIGNED
+
+INBOX_URL = "https://example.com/users/bob/inbox"
+INBOX_PATH = "/users/bob/inbox"
+
+# Signers cache signatures per inbox and second, sign for a new inbox each call
+_inbox_numbers = itertools.count()
+
+def new_inbox() -> str:
+    return f"https://example.com/users/bob{next(_inbox_numbers)}/inbox"
+
+def project_version() -> str:
+    with open(os.path.join(HERE, "..", "pyproject.toml")) as f:
+        return re.search(r'^version = "([^"]+)"', f.read(), re.M).group(1)
+
+def make_benchmarks(server: FakeFederationServer, key: RSAKey, ed25519_key: Ed25519Key) -> list:
+    actor_url = server.actor_url("alice")
+    signer = Signer(key, server.key_id("alice"))
+    ed25519_signer = Signer(ed25519_key, server.ed25519_key_id("alice"), format="rfc9421")
+
+    follow = {
+        "@context": "https://www.w3.org/ns/activitystreams",
+        "id": f"{actor_url}#follows/1",
+        "type": "Follow",
+        "actor": actor_url,
+        "object": "https://example.com/users/bob",
+    }
+
+    body, signed_headers = signer.sign(INBOX_URL, follow)
+    signed_headers = list(signed_headers.items()) + [("Content-Type", "application/activity+json")]
+
+    ed25519_body, ed25519_headers = ed25519_signer.sign(INBOX_URL, follow)
+    ed25519_headers = list(ed25519_headers.items())
+
+    def headers_index():
+        headers = Headers(HEADERS)
+        headers.get("signature").value
+        for name in SIGNED:
+            headers.get(name)
+
+    def verify_cold():
+        key_store.cache.clear()
+        return verify_signature(follow, signed_headers, INBOX_PATH)
+
+    host = server.base_url.split("://")[1]
+    handles = [f"@user{i}@{host}" for i in range(100)]
+
+    def resolve_many_cold():
+        resolver = WebFingerResolver(scheme="http")
+        return resolver.resolve_many_sync(handles)
+
+    def actor_run():
+        actor = Actor()
+        actor.create("example.com", "bob", key.public_key)
+        actor.add_property_value("Website", "https://example.com")
+        return actor.run()
+
+    actor_document = actor_run()
+    actor_json = codec.dumps(actor_document)
+
+    return [
+        ("headers_index", headers_index),
+        ("signature_header_parse", lambda: SignatureHeader(SIGNATURE)),
+        ("verify_signature", lambda: verify_signature(follow, signed_headers, INBOX_PATH)),
+        ("verify_signature_cold", verify_cold),
+        ("verify_request", lambda: verify_request(body, signed_headers, INBOX_PATH)),
+        ("verify_request_ed25519", lambda: verify_request(ed25519_body, ed25519_headers, INBOX_PATH)),
+        ("signer_sign", lambda: signer.sign(new_inbox(), follow)),
+        ("signer_sign_ed25519", lambda: ed25519_signer.sign(new_inbox(), follow)),
+        ("signer_sign_many_100", lambda: signer.sign_many([new_inbox() for _ in range(100)], follow)),
+        ("make_signature", lambda: make_signature(new_inbox(), follow, server.key_id("alice"))),
+        ("actor_run", actor_run),
+        ("actor_fetch_cached", lambda: Actor.fetch(actor_url)),
+        ("fetch_document", lambda: fetch_document(actor_url)),
+        ("inbox_parse", lambda: Inbox(follow).parse()),
+        ("codec_dumps_actor", lambda: codec.dumps(actor_document)),
+        ("codec_loads_actor", lambda: codec.loads(actor_json)),
+        ("webfinger_resolve_many_100", resolve_many_cold),
+    ]
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--filter", help="only run benchmarks whose name contains this")
+    parser.add_argument("--min-time", type=float, default=1.0, help="seconds to run each benchmark")
+    parser.add_argument("--save", nargs="?", const="", help="save the results as a baseline")
+    parser.add_argument("--compare", help="compare with a saved baseline")
+    args = parser.parse_args()
+
+    # make_signature always reads this key
+    key = RSAKey("/tmp/key.pem")
+    ed25519_key = Ed25519Key("/tmp/ed25519.pem")
+    multibase = multibase_public_key(ed25519_key.key.public_key())
+
+    with FakeFederationServer(key.public_key.decode(), multibase) as server:
+        results = []
+
+        for name, fn in make_benchmarks(server, key, ed25519_key):
+            if args.filter and args.filter not in name:
+                continue
+            results.append(bench(name, fn, min_time=args.min_time))
+
+    key_store.cache.clear()
+    actor_cache.clear()
+
+    baseline = load_baseline(args.compare) if args.compare else None
+    regressions = print_results(results, baseline)
+
+    if args.save is not None:
+        version = project_version()
+        path = args.save or os.path.join(HERE, "baselines", f"{version}.json")
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        save_baseline(path, results, version)
+        print(f"Saved baseline to {path}")
+
+    return 1 if regressions else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -12,20 +12,46 @@ $ uvicorn run:app --host 0.0.0.0 --workers 2
 """
 
 import os
-import json
-import requests
+import asyncio
+import functools
 
 from fastapi import FastAPI, Request
-from fastapi.responses import RedirectResponse, JSONResponse, FileResponse
+from fastapi.responses import RedirectResponse, JSONResponse, FileResponse, Response, PlainTextResponse
 
-from src.activity_tools.objects import Actor, WrapActivityStreamsObject, Follow, Undo, Accept
+from src.activity_tools.objects import Actor, WrapActivityStreamsObject, Follow, Undo, Accept, set_document_store
 from src.activity_tools.misc import PublicKey, WebFinger
-from src.activity_tools.headers import ContentTypes, verify_signature, make_signature
-from src.activity_tools.inbox import Inbox
+from src.activity_tools.headers import ContentTypes, verify_request, Signer
+from src.activity_tools.inbox import Dispatcher
+from src.activity_tools.inbox_queue import InboxQueue, QueuedRequest
+from src.activity_tools.dedup import DuplicateFilter
+from src.activity_tools.store import DocumentStore
+from src.activity_tools import metrics
 from src.activity_tools.crypto import RSAKey
+from src.activity_tools.render import RenderCache
+from src.activity_tools.followers import SQLiteFollowerStore
+from src.activity_tools.transport import get_transport
 
 DOMAIN = os.getenv("DOMAIN", "example.com")
-KEY = RSAKey("/tmp/key.pem")
+RENDER_CACHE = RenderCache()
+FOLLOWERS = SQLiteFollowerStore("/tmp/followers.db")
+DISPATCHER = Dispatcher()
+INBOX_QUEUE = InboxQueue("/tmp/inbox.db")
+DUPLICATES = DuplicateFilter(maxsize=10000, bloom_capacity=1000000)
+
+# Remote actors and keys are kept on disk and shared by all workers
+set_document_store(DocumentStore("/tmp/documents.db"))
+
+metrics.enable()
+
+# The key is loaded, or generated, on first use and not when the app is
+# imported. Generating a 2048-bit key takes a while.
+@functools.cache
+def get_key() -> RSAKey:
+    return RSAKey("/tmp/key.pem")
+
+@functools.cache
+def get_signer() -> Signer:
+    return Signer(get_key())
 
 app = FastAPI(
     title="ActivityPub Example Application",
@@ -38,60 +64,109 @@ def redirect_to_docs():
     response = RedirectResponse(url='/docs')
     return response
 
-@app.get("/.well-known/webfinger")
-def webfinger(resource: str):
-    content = WebFinger(DOMAIN, resource).run()
-    return JSONResponse(content=content, headers=ContentTypes.jrd)
-
-@app.get("/users/{username}")
-def users(username: str):
+@app.get("/metrics", include_in_schema=False)
+def prometheus_metrics():
+    return PlainTextResponse(metrics.registry.prometheus_text())
 
+@app.get("/.well-known/webfinger")
+def webfinger(resource: str, request: Request):
+    status, body, headers = RENDER_CACHE.respond(
+        f"webfinger:{resource}",
+        lambda: WebFinger(DOMAIN, resource).run(),
+        request.headers.get("if-none-match")
+    )
+    return Response(content=body, status_code=status, headers={ **ContentTypes.jrd, **headers })
+
+def make_actor(username: str) -> dict:
     actor = Actor()
-    actor.create(DOMAIN, username, KEY.public_key)
+    actor.create(DOMAIN, username, get_key().public_key)
     actor.followers = None
     actor.following = None
     actor.outbox = None
 
-    return JSONResponse(content=actor.run(), headers=ContentTypes.activity)
+    return actor.run()
+
+@app.get("/users/{username}")
+def users(username: str, request: Request):
+    # Call RENDER_CACHE.invalidate(f"actor:{username}") when the actor changes
+    status, body, headers = RENDER_CACHE.respond(
+        f"actor:{username}",
+        lambda: make_actor(username),
+        request.headers.get("if-none-match")
+    )
+    return Response(content=body, status_code=status, headers={ **ContentTypes.activity, **headers })
 
 @app.get("/users/{username}/key")
-def users(username: str):
-    public_key = KEY.public_key.decode()
-    object = WrapActivityStreamsObject(PublicKey(DOMAIN, username, public_key))
-    print(object.run())
-    return JSONResponse(content=object.run(), headers=ContentTypes.activity)
+def users(username: str, request: Request):
+    status, body, headers = RENDER_CACHE.respond(
+        f"key:{username}",
+        lambda: WrapActivityStreamsObject(PublicKey(DOMAIN, username, get_key().public_key.decode())).run(),
+        request.headers.get("if-none-match")
+    )
+    return Response(content=body, status_code=status, headers={ **ContentTypes.activity, **headers })
 
 @app.post('/users/{username}/inbox')
 async def inbox(username: str, request: Request):
 
-    body = json.loads(await request.body())
-
-    if not verify_signature(body, request.headers.items(), request.url.path):
-        content = { "message": "Invalid signature" }
+    # Only cheap checks here, the request is verified by a queue worker.
+    # The body is read up to the queue's size limit.
+    if not await INBOX_QUEUE.accept_stream(request.stream(), request.headers.items(), request.url.path):
+        content = { "message": "Invalid request" }
         return JSONResponse(
             content=content,
             headers=ContentTypes.activity,
-            status_code=401
+            status_code=400
         )
 
-    inbox = Inbox(body)
-    object = inbox.parse()
+    return Response(status_code=202)
 
-    if type(object) == Follow:
-        follow = object
-        accept = Accept(follow)
+def handle_inbox_request(request: QueuedRequest):
+    body = verify_request(request.body, request.headers, request.path, duplicates=DUPLICATES)
 
-        respond_to_url = follow.actor.inbox
-        public_key_url = follow.object.public_key["id"]
-        signature = make_signature(respond_to_url, accept.run(), public_key_url)
+    if body is None:
+        print(f"Dropped inbox request {request.id}, invalid signature or a duplicate")
+        return
 
-        r = requests.post(
-            object.actor.inbox,
-            data=json.dumps(accept.run()),
-            headers={ **ContentTypes.activity, **signature }
-        )
+    asyncio.run(DISPATCHER.dispatch_async(body))
+
+    # Only once it has been handled, a failed request is retried by the queue
+    DUPLICATES.record(body, request.headers)
+
+@app.on_event("startup")
+def start_inbox_workers():
+    INBOX_QUEUE.start(handle_inbox_request, workers=4)
+
+@app.on_event("shutdown")
+def stop_inbox_workers():
+    INBOX_QUEUE.stop()
+
+@DISPATCHER.on("Follow")
+async def follow(follow: Follow):
+    follow_actor = await follow.fetch_actor()
+    follow_object = await follow.fetch_object()
+
+    # The actors are cached now, Accept will not block on a fetch
+    accept = Accept(follow)
+
+    respond_to_url = follow_actor.inbox
+    public_key_url = follow_object.public_key["id"]
+    body, signature = get_signer().sign(respond_to_url, accept.run(), public_key_url)
+
+    r = await asyncio.to_thread(
+        get_transport().post,
+        respond_to_url,
+        body,
+        headers={ **ContentTypes.activity, **signature }
+    )
+
+    print(r.status, r.body)
+
+    FOLLOWERS.add_actor(follow_object.id, follow_actor)
 
-        print(r.status_code, r.content)
+@DISPATCHER.on("Undo")
+async def undo(undo: Undo):
+    print("We got a undo request!")
 
-    elif type(object) == Undo:
-        print("We got a undo request!")
+    undone = undo.raw["object"]
+    if isinstance(undone, dict) and undone.get("type") == "Follow":
+        FOLLOWERS.remove(undone["object"], undo.actor_id)
@@ -0,0 +1,160 @@
+import time
+import threading
+from urllib.parse import urlparse
+
+from .cache import TTLCache
+from . import metrics
+
+class FetchError(Exception):
+    """
+    Raised when a remote resource could not be fetched, or was not
+    requested because of an earlier failure.
+    """
+
+    url: str
+    """ The URL that failed """
+
+    status: int
+    """ The HTTP status code, or `None` for timeouts and connection errors """
+
+    def __init__(self, url: str, status: int = None, message: str = None) -> None:
+        self.url = url
+        self.status = status
+        super().__init__(message or f"{url} responded with a {status}")
+
+NEGATIVE_TTLS = {
+    401: 600,
+    403: 600,
+    404: 3600,
+    410: 86400,
+}
+""" Seconds to remember a failed URL, by HTTP status """
+
+NEGATIVE_TTL_DEFAULT = 300
+""" Seconds to remember failures with other statuses """
+
+class NegativeCache:
+    """
+    Remembers URLs that failed, so they are not requested again for a
+    while. The time depends on the status, a 410 Gone account is remembered
+    for a day while a 500 is only remembered for minutes. Hosts that time
+    out or refuse connections are handled by `CircuitBreaker`.
+    """
+
+    def __init__(self, maxsize: int = 100000, ttls: dict = None) -> None:
+        self.cache = TTLCache(maxsize=maxsize, ttl=NEGATIVE_TTL_DEFAULT)
+        self.ttls = ttls if ttls is not None else NEGATIVE_TTLS
+
+    def add(self, url: str, status: int) -> None:
+        """
+        Remember that `url` responded with `status`.
+        """
+        self.cache.set(url, status, self.ttls.get(status, NEGATIVE_TTL_DEFAULT))
+
+    def get(self, url: str) -> FetchError:
+        """
+        Returns the remembered error for `url`, or `None`.
+        """
+        status = self.cache.get(url)
+        return FetchError(url, status) if status is not None else None
+
+    def invalidate(self, url: str) -> None:
+        """
+        Forget a failed URL.
+        """
+        self.cache.invalidate(url)
+
+class CircuitBreaker:
+    """
+    A circuit breaker per host. After `threshold` consecutive failures the
+    circuit opens and requests to the host fail fast. After `reset_timeout`
+    seconds one trial request is let through, it closes the circuit if it
+    succeeds and opens it again if it fails.
+    """
+
+    def __init__(self, threshold: int = 5, reset_timeout: float = 60) -> None:
+        self.threshold = threshold
+        self.reset_timeout = reset_timeout
+        self._hosts = {}
+        self._lock = threading.Lock()
+
+    def allow(self, host: str) -> bool:
+        """
+        Returns true if a request to `host` may be made.
+        """
+        with self._lock:
+            state = self._hosts.get(host)
+
+            if state is None or state["opened_at"] is None:
+                return True
+
+            if state["trial"] or time.monotonic() - state["opened_at"] < self.reset_timeout:
+                return False
+
+            state["trial"] = True
+            return True
+
+    def success(self, host: str) -> None:
+        """
+        Record a successful request to `host`.
+        """
+        with self._lock:
+            self._hosts.pop(host, None)
+
+    def failure(self, host: str) -> None:
+        """
+        Record a failed request, a timeout, connection error or 5xx, to `host`.
+        """
+        with self._lock:
+            state = self._hosts.setdefault(host, { "failures": 0, "opened_at": None, "trial": False })
+            state["failures"] += 1
+
+            if state["trial"] or state["failures"] >= self.threshold:
+                state["opened_at"] = time.monotonic()
+                state["trial"] = False
+
+    def is_open(self, host: str) -> bool:
+        """
+        Returns true if requests to `host` currently fail fast.
+        """
+        with self._lock:
+            state = self._hosts.get(host)
+            return state is not None and state["opened_at"] is not None
+
+negative_cache = NegativeCache()
+""" Shared negative cache used when fetching remote resources """
+
+metrics.registry.register_cache("negative", negative_cache.cache)
+
+circuit_breaker = CircuitBreaker()
+""" Shared circuit breaker used for fetches and deliveries """
+
+def check(url: str) -> None:
+    """
+    Raise a `FetchError` if `url` failed recently or its host's circuit is
+    open. Call this before a request.
+    """
+    error = negative_cache.get(url)
+    if error is not None:
+        raise error
+
+    host = urlparse(url).netloc
+    if not circuit_breaker.allow(host):
+        raise FetchError(url, None, f"Circuit for {host} is open")
+
+def record(url: str, status: int = None, error: Exception = None) -> None:
+    """
+    Record the outcome of a request to `url`. Pass the HTTP `status`, or the
+    `error` if the request failed without a response.
+    """
+    host = urlparse(url).netloc
+
+    if error is not None:
+        circuit_breaker.failure(host)
+    elif status >= 500:
+        circuit_breaker.failure(host)
+        negative_cache.add(url, status)
+    else:
+        circuit_breaker.success(host)
+        if status >= 400:
+            negative_cache.add(url, status)
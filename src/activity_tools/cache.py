@@ -0,0 +1,135 @@
+import time
+import threading
+import weakref
+from collections import OrderedDict
+
+class TTLCache:
+    """
+    A small thread safe cache with a time to live and a bounded size. When
+    the cache is full the least recently used entry is evicted. Entries
+    older than `ttl` seconds are treated as missing.
+
+    ```python
+    Example:
+        cache = TTLCache(maxsize=1000, ttl=300)
+        cache.set("https://example.com/users/foo", actor)
+        actor = cache.get("https://example.com/users/foo")
+        print(cache.hits, cache.misses)
+    ```
+    """
+
+    hits: int
+    """ Number of successful lookups """
+
+    misses: int
+    """ Number of lookups that did not find a (fresh) entry """
+
+    def __init__(self, maxsize: int = 1024, ttl: float = 300) -> None:
+        """
+        Create an empty cache that holds at most `maxsize` entries for
+        `ttl` seconds each.
+        """
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        self._inflight = weakref.WeakKeyDictionary()
+
+    def get(self, key, default=None):
+        """
+        Return the cached value for `key`, or `default` if it is missing
+        or has expired.
+        """
+        with self._lock:
+            entry = self._data.get(key)
+
+            if entry is None:
+                self.misses += 1
+                return default
+
+            expires, value = entry
+
+            if expires < time.monotonic():
+                del self._data[key]
+                self.misses += 1
+                return default
+
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key, value, ttl: float = None) -> None:
+        """
+        Store `value` under `key`. The optional `ttl` overrides the
+        cache wide time to live for this entry.
+        """
+        if ttl is None:
+            ttl = self.ttl
+
+        with self._lock:
+            self._data[key] = (time.monotonic() + ttl, value)
+            self._data.move_to_end(key)
+
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    async def get_or_fetch_async(self, key, fetch):
+        """
+        Return the cached value for `key`. On a miss the blocking callable
+        `fetch` is run in a thread and its result is cached. Concurrent
+        misses for the same key share a single call to `fetch`.
+        """
+        value = self.get(key)
+        if value is not None:
+            return value
+
+        import asyncio
+
+        loop = asyncio.get_running_loop()
+        inflight = self._inflight.setdefault(loop, {})
+        task = inflight.get(key)
+
+        if task is None:
+            async def run():
+                try:
+                    value = await asyncio.to_thread(fetch)
+                    self.set(key, value)
+                    return value
+                finally:
+                    inflight.pop(key, None)
+
+            task = inflight[key] = loop.create_task(run())
+
+        return await asyncio.shield(task)
+
+    def invalidate(self, key) -> None:
+        """
+        Remove `key` from the cache, if present.
+        """
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self) -> None:
+        """
+        Remove all entries and reset the counters.
+        """
+        with self._lock:
+            self._data.clear()
+            self.hits = 0
+            self.misses = 0
+
+    @property
+    def hit_ratio(self) -> float:
+        """ Ratio of lookups that found a fresh entry """
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+    def __contains__(self, key) -> bool:
+        with self._lock:
+            entry = self._data.get(key)
+            return entry is not None and entry[0] >= time.monotonic()
+
+    def __len__(self) -> int:
+        return len(self._data)
@@ -0,0 +1,119 @@
+import re
+from itertools import accumulate
+
+MAX_DOCUMENT_SIZE = 1024 * 1024
+""" Default limit, in bytes, for documents passed to `loads` """
+
+MAX_DEPTH = 64
+""" Default limit for how deeply arrays and objects may be nested """
+
+BACKENDS = ("orjson", "ujson", "json")
+""" Supported JSON libraries, the first one that is installed is used """
+
+# A string runs to the end of the document if it is not terminated, so the
+# pattern never backtracks and the scan stays linear
+_STRING_PATTERN = re.compile(rb'"(?:[^"\\]+|\\(?:.|\Z))*(?:"|\Z)', re.S)
+_NOT_BRACKETS = bytes(c for c in range(256) if c not in b"[]{}")
+_DEPTH_STEPS = [1 if c in b"[{" else -1 for c in range(256)]
+
+# The library is picked, and imported, on first use, see `_get_backend`
+_backend = None
+
+class JSONLimitError(ValueError):
+    """
+    Raised by `loads` when a document is larger, or nested deeper, than
+    allowed. It is a `ValueError`, like a syntax error in the document.
+    """
+
+def dumps(object) -> bytes:
+    """
+    Serialize `object` to compact UTF-8 encoded JSON bytes.
+    """
+    name, module = _get_backend()
+
+    if name == "orjson":
+        try:
+            return module.dumps(object)
+        except TypeError:
+            # orjson is stricter than json, for example about integers
+            # larger than 64 bits and keys that are not strings
+            pass
+    elif name == "ujson":
+        return module.dumps(object, ensure_ascii=False, escape_forward_slashes=False).encode("utf-8")
+
+    import json
+
+    return json.dumps(object, separators=(",", ":")).encode("utf-8")
+
+def loads(data, max_size: int = MAX_DOCUMENT_SIZE, max_depth: int = MAX_DEPTH):
+    """
+    Parse a JSON document from bytes or a string. Raises `JSONLimitError`
+    if it is larger than `max_size` bytes or nested deeper than `max_depth`,
+    before it is parsed, use `max_size=None` for no size limit. Raises
+    `ValueError` if it is not valid JSON.
+
+    The depth is always limited, some versions of orjson crash the
+    interpreter on very deeply nested documents.
+    """
+    if max_size is not None and len(data) > max_size:
+        raise JSONLimitError(f"The document is larger than {max_size} bytes")
+
+    _check_depth(data.encode("utf-8", "surrogatepass") if isinstance(data, str) else data, max_depth)
+
+    module = _get_backend()[1]
+
+    try:
+        return module.loads(data)
+    except RecursionError:
+        raise JSONLimitError("The document is nested too deeply")
+
+def backend() -> str:
+    """
+    Returns the name of the JSON library that is used, see `BACKENDS`.
+    """
+    return _get_backend()[0]
+
+def set_backend(name: str = None) -> None:
+    """
+    Use the JSON library `name`, or the first one that is installed if
+    `name` is `None`. Raises an exception if it is not installed.
+    """
+    global _backend
+
+    if name is None:
+        _backend = None
+        return
+
+    if name not in BACKENDS:
+        raise Exception(f"Unknown JSON backend {name}")
+
+    import importlib
+
+    _backend = (name, importlib.import_module(name))
+
+def _get_backend() -> tuple:
+    global _backend
+
+    if _backend is None:
+        import importlib
+
+        for name in BACKENDS:
+            try:
+                _backend = (name, importlib.import_module(name))
+                break
+            except ImportError:
+                continue
+
+    return _backend
+
+def _check_depth(data: bytes, max_depth: int) -> None:
+    # A document with fewer containers than max_depth can't nest deeper,
+    # that is true for most documents and skips the scan
+    if data.count(b"{") + data.count(b"[") <= max_depth:
+        return
+
+    # Strings may contain brackets, drop them and keep only the brackets
+    brackets = _STRING_PATTERN.sub(b"", data).translate(None, _NOT_BRACKETS)
+
+    if max(accumulate(map(_DEPTH_STEPS.__getitem__, brackets)), default=0) > max_depth:
+        raise JSONLimitError(f"The document is nested deeper than {max_depth} levels")
@@ -0,0 +1,140 @@
+from urllib.parse import quote
+
+from . import codec
+
+class OrderedCollection:
+    """
+    Builds cursor paginated `OrderedCollection` and `OrderedCollectionPage`
+    documents, for outboxes and follower/following lists. Items are read from
+    a storage callback one page at a time, and pages can be streamed so only
+    one item is held in memory at a time.
+
+    The callback is called as `fetch(max_id=None, min_id=None, limit=20)` and
+    returns an iterable of `(cursor, item)` tuples, newest first. With `max_id`
+    it returns items older than that cursor, with `min_id` the items closest
+    to and newer than that cursor. Cursors are strings or integers.
+
+    ```python
+    Example:
+        def fetch(max_id=None, min_id=None, limit=20):
+            for row in db.posts(username, max_id, min_id, limit):
+                yield row.id, row.activity
+
+        outbox = OrderedCollection(
+            f"https://{domain}/users/{username}/outbox",
+            fetch,
+            total_items=lambda: db.count_posts(username)
+        )
+
+        index = outbox.run()
+        chunks = outbox.stream_page(max_id=request.query_params.get("max_id"))
+    ```
+    """
+
+    def __init__(self, id: str, fetch, total_items=None, page_size: int = 20, context=None) -> None:
+        """
+        Create a collection with the URL `id`. The optional `total_items` is
+        a number or a callable that returns it. Use `context` to override the
+        JSON-LD context of the documents.
+        """
+        self.id = id
+        self.fetch = fetch
+        self.total_items = total_items
+        self.page_size = page_size
+        self.context = context or "https://www.w3.org/ns/activitystreams"
+
+    def page_id(self, max_id=None, min_id=None) -> str:
+        """
+        Returns the URL of a page.
+        """
+        page_id = f"{self.id}?page=true"
+
+        if max_id is not None:
+            page_id += f"&max_id={quote(str(max_id), safe='')}"
+
+        if min_id is not None:
+            page_id += f"&min_id={quote(str(min_id), safe='')}"
+
+        return page_id
+
+    def run(self) -> dict:
+        """
+        Returns the `OrderedCollection` document. It only links to the first
+        page, no items are fetched.
+        """
+        document = {
+            "@context": self.context,
+            "id": self.id,
+            "type": "OrderedCollection",
+            "first": self.page_id(),
+        }
+
+        total_items = self.total_items() if callable(self.total_items) else self.total_items
+        if total_items is not None:
+            document["totalItems"] = total_items
+
+        return document
+
+    def page(self, max_id=None, min_id=None) -> dict:
+        """
+        Returns a `OrderedCollectionPage` document as a dict.
+        """
+        items = []
+        links = {}
+
+        for item in self._items(max_id, min_id, links):
+            items.append(item)
+
+        return { **self._page_head(max_id, min_id), "orderedItems": items, **links }
+
+    def stream_page(self, max_id=None, min_id=None):
+        """
+        Like `page`, but a generator that yields the document as JSON encoded
+        chunks of bytes. Items are serialized one at a time as they are read
+        from the callback, use it with a streaming response.
+        """
+        head = codec.dumps(self._page_head(max_id, min_id))
+        yield head[:-1] + b',"orderedItems":['
+
+        links = {}
+        separator = b""
+
+        for item in self._items(max_id, min_id, links):
+            yield separator + codec.dumps(item)
+            separator = b","
+
+        tail = b"".join(b"," + codec.dumps(k) + b":" + codec.dumps(v) for k, v in links.items())
+        yield b"]" + tail + b"}"
+
+    def _page_head(self, max_id, min_id) -> dict:
+        return {
+            "@context": self.context,
+            "id": self.page_id(max_id, min_id),
+            "type": "OrderedCollectionPage",
+            "partOf": self.id,
+        }
+
+    def _items(self, max_id, min_id, links: dict):
+        # Yields the items of a page and fills in the next/prev links when done
+        first_cursor = None
+        last_cursor = None
+        count = 0
+
+        for cursor, item in self.fetch(max_id=max_id, min_id=min_id, limit=self.page_size):
+            if first_cursor is None:
+                first_cursor = cursor
+            last_cursor = cursor
+            count += 1
+            yield item
+
+        if count == 0:
+            return
+
+        # A full page may have older items, and so has any page requested
+        # with min_id since the min_id item itself is older.
+        if count >= self.page_size or min_id is not None:
+            links["next"] = self.page_id(max_id=last_cursor)
+
+        # The first page has nothing newer, other pages may have.
+        if max_id is not None or min_id is not None:
+            links["prev"] = self.page_id(min_id=first_cursor)
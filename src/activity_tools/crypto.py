@@ -1,23 +1,29 @@
 import os
+from typing import TYPE_CHECKING
 
-from cryptography.hazmat.primitives import serialization
-from cryptography.hazmat.primitives.asymmetric import rsa
-from cryptography.hazmat.backends import default_backend
+# cryptography is imported on first use, see the functions below
+if TYPE_CHECKING:
+    from cryptography.hazmat.primitives.asymmetric import rsa, ed25519
 
-class RSAKey():
-    """
-    This class holds private and public RSA keypairs with file
-    load and save functionality. This is an utility class that
-    you are free to ignore if you prefer to use your own
-    cryptographic functions.
+SIGNATURE_ALGORITHMS = {
+    "rsa": ("rsa-sha256", "rsa-v1_5-sha256", "hs2019"),
+    "ed25519": ("ed25519", "hs2019"),
+}
+"""
+Signature algorithm names that may be used with each key type. `rsa-sha256`
+and `hs2019` are the draft-cavage names, `rsa-v1_5-sha256` and `ed25519` are
+the RFC 9421 names.
+"""
 
-    ```python
-    Example:
-        key = RSAKey("/my/path/key.pem")
-        print(key.public_key)
-        signed = key.sign(text, padding.PKCS1v15(), hashes.SHA256())
-    ```
+class KeyPair():
     """
+    A private key, and its public key, with file load and save
+    functionality. The key is loaded from the path, or generated and saved
+    if the file does not exist. See `RSAKey` and `Ed25519Key`.
+    """
+
+    key_type: str
+    """ The key type, `rsa` or `ed25519` """
 
     def __init__(self, path) -> None:
         """
@@ -31,11 +37,15 @@ class RSAKey():
             key = self.load_private_key(path)
         else:
             key = self.generate_private_key()
+
+        self.key = key
+        """ The private key object from cryptography """
+
+        if not os.path.exists(path):
             self.save_private_key(path)
             print(f"Saved newly generated keys to {path}")
 
-        self.key: rsa.RSAPrivateKey = key
-        """ The RSAPrivateKey object from cryptography """
+        from cryptography.hazmat.primitives import serialization
 
         self.private_key: bytes = self.key.private_bytes(
             serialization.Encoding.PEM,
@@ -49,37 +59,219 @@ class RSAKey():
         )
         """ Contains the public key """
 
-    def generate_private_key(self) -> rsa.RSAPrivateKey:
+    def generate_private_key(self):
         """
-        Generate a RSA private key and returns it. The constructor calles this
+        Generate a private key and returns it. The constructor calles this
         to generate a private key.
         """
-        return rsa.generate_private_key(
-            public_exponent=65537, key_size=2048, backend=default_backend()
-        )
+        raise NotImplementedError
 
     def save_private_key(self, path: str) -> None:
         """
         Export the private key to bytes and write them to the specified
         filepath. The constructor uses this to write the keys to storate.
         """
+        from cryptography.hazmat.primitives import serialization
+
         pem = self.key.private_bytes(
             encoding=serialization.Encoding.PEM,
             format=serialization.PrivateFormat.PKCS8,
             encryption_algorithm=serialization.NoEncryption()
         )
-        
+
         with open(path, 'wb') as pem_out:
             pem_out.write(pem)
 
-    def load_private_key(self, path: str) -> rsa.RSAPrivateKey:
+    def load_private_key(self, path: str):
         """
         Import and load a private key from a file.
         """
+        from cryptography.hazmat.primitives import serialization
+        from cryptography.hazmat.backends import default_backend
+
         with open(path, "rb") as key_file:
             key = serialization.load_pem_private_key(
                 key_file.read(),
                 password=None,
                 backend=default_backend()
         )
+
+        if key_type(key) != self.key_type:
+            raise Exception(f"{path} is not a {self.key_type} key")
+
         return key
+
+    def sign(self, message: bytes) -> bytes:
+        """
+        Sign `message` with the private key, see `sign_message`.
+        """
+        return sign_message(self.key, message)
+
+class RSAKey(KeyPair):
+    """
+    This class holds private and public RSA keypairs with file
+    load and save functionality. This is an utility class that
+    you are free to ignore if you prefer to use your own
+    cryptographic functions.
+
+    ```python
+    Example:
+        key = RSAKey("/my/path/key.pem")
+        print(key.public_key)
+        signed = key.sign(text)
+    ```
+    """
+
+    key_type = "rsa"
+
+    key: "rsa.RSAPrivateKey"
+    """ The RSAPrivateKey object from cryptography """
+
+    def generate_private_key(self) -> "rsa.RSAPrivateKey":
+        """
+        Generate a RSA private key and returns it. The constructor calles this
+        to generate a private key.
+        """
+        from cryptography.hazmat.primitives.asymmetric import rsa
+        from cryptography.hazmat.backends import default_backend
+
+        return rsa.generate_private_key(
+            public_exponent=65537, key_size=2048, backend=default_backend()
+        )
+
+class Ed25519Key(KeyPair):
+    """
+    Holds an Ed25519 keypair with file load and save functionality, like
+    `RSAKey`. Ed25519 signs many times faster than RSA, but not all
+    servers can verify it yet. Publish the public key as a Multikey, see
+    `Actor.add_multikey`, and sign with RFC 9421, see `Signer`.
+
+    ```python
+    Example:
+        key = Ed25519Key("/my/path/ed25519.pem")
+        print(multibase_public_key(key.key.public_key()))
+    ```
+    """
+
+    key_type = "ed25519"
+
+    key: "ed25519.Ed25519PrivateKey"
+    """ The Ed25519PrivateKey object from cryptography """
+
+    def generate_private_key(self) -> "ed25519.Ed25519PrivateKey":
+        """
+        Generate an Ed25519 private key and returns it.
+        """
+        from cryptography.hazmat.primitives.asymmetric import ed25519
+
+        return ed25519.Ed25519PrivateKey.generate()
+
+def key_type(key) -> str:
+    """
+    Returns `rsa` or `ed25519` for a private or public key object from
+    cryptography. Raises an exception for other key types.
+    """
+    from cryptography.hazmat.primitives.asymmetric import rsa, ed25519
+
+    if isinstance(key, (rsa.RSAPrivateKey, rsa.RSAPublicKey)):
+        return "rsa"
+    if isinstance(key, (ed25519.Ed25519PrivateKey, ed25519.Ed25519PublicKey)):
+        return "ed25519"
+
+    raise Exception(f"Unsupported key type {type(key).__name__}")
+
+def sign_message(private_key, message: bytes) -> bytes:
+    """
+    Sign `message` with a private key object from cryptography. RSA keys
+    sign with PKCS1v15 and SHA-256.
+    """
+    if key_type(private_key) == "ed25519":
+        return private_key.sign(message)
+
+    from cryptography.hazmat.primitives import hashes
+    from cryptography.hazmat.primitives.asymmetric import padding
+
+    return private_key.sign(message, padding.PKCS1v15(), hashes.SHA256())
+
+def verify_message(public_key, signature: bytes, message: bytes, algorithm: str = None) -> bool:
+    """
+    Verify the `signature` of `message` with a public key object from
+    cryptography. If the signature names an `algorithm`, it must be one of
+    the `SIGNATURE_ALGORITHMS` of the key type. Returns a boolean value.
+    """
+    from cryptography.exceptions import InvalidSignature
+
+    try:
+        kind = key_type(public_key)
+    except Exception:
+        return False
+
+    if algorithm is not None and algorithm.lower() not in SIGNATURE_ALGORITHMS[kind]:
+        return False
+
+    try:
+        if kind == "ed25519":
+            public_key.verify(signature, message)
+        else:
+            from cryptography.hazmat.primitives import hashes
+            from cryptography.hazmat.primitives.asymmetric import padding
+
+            public_key.verify(signature, message, padding.PKCS1v15(), hashes.SHA256())
+    except InvalidSignature:
+        return False
+
+    return True
+
+# Multikey (https://www.w3.org/TR/controller-document/#multikey) encodes the
+# raw public key with a multicodec prefix, in base58btc with a "z" prefix.
+_BASE58 = "123456789ABCDEFGHJKLMNPQRSTUVWXYZabcdefghijkmnopqrstuvwxyz"
+_ED25519_MULTICODEC = b"\xed\x01"
+
+def _base58_encode(data: bytes) -> str:
+    number = int.from_bytes(data, "big")
+    encoded = ""
+
+    while number:
+        number, remainder = divmod(number, 58)
+        encoded = _BASE58[remainder] + encoded
+
+    return "1" * (len(data) - len(data.lstrip(b"\0"))) + encoded
+
+def _base58_decode(text: str) -> bytes:
+    number = 0
+
+    for char in text:
+        index = _BASE58.find(char)
+        if index < 0:
+            raise Exception(f"Invalid base58 character {char!r}")
+        number = number * 58 + index
+
+    decoded = number.to_bytes((number.bit_length() + 7) // 8, "big")
+    return b"\0" * (len(text) - len(text.lstrip("1"))) + decoded
+
+def multibase_public_key(public_key) -> str:
+    """
+    Encode an Ed25519 public key object as a Multikey `publicKeyMultibase`
+    value.
+    """
+    from cryptography.hazmat.primitives import serialization
+
+    raw = public_key.public_bytes(serialization.Encoding.Raw, serialization.PublicFormat.Raw)
+    return "z" + _base58_encode(_ED25519_MULTICODEC + raw)
+
+def load_multibase_public_key(value: str):
+    """
+    Decode a Multikey `publicKeyMultibase` value to a public key object.
+    Only Ed25519 keys are supported, other keys raise an exception.
+    """
+    if not value.startswith("z"):
+        raise Exception("Only base58btc encoded Multikeys are supported")
+
+    data = _base58_decode(value[1:])
+
+    if not data.startswith(_ED25519_MULTICODEC) or len(data) != 34:
+        raise Exception("Only Ed25519 Multikeys are supported")
+
+    from cryptography.hazmat.primitives.asymmetric import ed25519
+
+    return ed25519.Ed25519PublicKey.from_public_bytes(data[2:])
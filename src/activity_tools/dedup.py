@@ -0,0 +1,167 @@
+import math
+import time
+import hashlib
+import threading
+
+from .cache import TTLCache
+from .headers import Headers
+from . import metrics
+
+class BloomFilter:
+    """
+    A fixed size Bloom filter. Membership tests may return false positives
+    at about `error_rate`, but never false negatives.
+    """
+
+    def __init__(self, capacity: int, error_rate: float = 0.001) -> None:
+        """
+        Create a filter sized for `capacity` keys.
+        """
+        self.size = max(8, int(-capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.hashes = max(1, round(self.size / capacity * math.log(2)))
+        self.bits = bytearray((self.size + 7) // 8)
+
+    def _positions(self, key: str):
+        digest = hashlib.blake2b(key.encode("utf-8"), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], "little")
+        h2 = int.from_bytes(digest[8:], "little") | 1
+
+        for i in range(self.hashes):
+            yield (h1 + i * h2) % self.size
+
+    def add(self, key: str) -> None:
+        for position in self._positions(key):
+            self.bits[position >> 3] |= 1 << (position & 7)
+
+    def __contains__(self, key: str) -> bool:
+        for position in self._positions(key):
+            if not self.bits[position >> 3] & (1 << (position & 7)):
+                return False
+        return True
+
+class DuplicateFilter:
+    """
+    Detects activities that have already been received, by activity ID and
+    by Signature header value, so retries and relayed copies can be dropped
+    before an actor fetch or a signature verification.
+
+    Keys are kept in a bounded LRU set for `ttl` seconds. With a
+    `bloom_capacity` keys are also added to a pair of rotating Bloom
+    filters, they remember keys for `ttl` to `2 * ttl` seconds in constant
+    memory, at the cost of a small rate of false positives.
+
+    Check with `is_duplicate` before the expensive work, and `record` the
+    activity once it has been verified and handled, so forged copies can not
+    block the real activity and failed attempts can be retried. Activity IDs
+    are remembered per actor, so one sender can not block the activities of
+    another by sending their IDs first.
+
+    ```python
+    Example:
+        duplicates = DuplicateFilter(maxsize=100000, ttl=3600)
+
+        if duplicates.is_duplicate(object, headers):
+            return
+        if verify_signature(object, headers, inbox_path):
+            handle(object)
+            duplicates.record(object, headers)
+    ```
+    """
+
+    checks: int
+    """ Number of `is_duplicate` calls """
+
+    duplicates: int
+    """ Number of `is_duplicate` calls that found a duplicate """
+
+    def __init__(self, maxsize: int = 100000, ttl: float = 3600, bloom_capacity: int = None, error_rate: float = 0.001) -> None:
+        self.ttl = ttl
+        self.recent = TTLCache(maxsize=maxsize, ttl=ttl)
+        self.bloom_capacity = bloom_capacity
+        self.error_rate = error_rate
+        self.checks = 0
+        self.duplicates = 0
+
+        self._lock = threading.Lock()
+        self._bloom = None
+        self._previous_bloom = None
+        self._bloom_started = time.monotonic()
+
+        if bloom_capacity:
+            self._bloom = BloomFilter(bloom_capacity, error_rate)
+
+        metrics.registry.register_cache("duplicates", self.recent)
+
+    @property
+    def hit_rate(self) -> float:
+        """ Ratio of checks that found a duplicate """
+        return self.duplicates / self.checks if self.checks else 0.0
+
+    def seen(self, key: str) -> bool:
+        """
+        Returns true if `key` has been added.
+        """
+        if key in self.recent:
+            return True
+
+        if self._bloom is None:
+            return False
+
+        with self._lock:
+            self._rotate()
+            return key in self._bloom or (self._previous_bloom is not None and key in self._previous_bloom)
+
+    def add(self, key: str) -> None:
+        """
+        Remember `key`.
+        """
+        self.recent.set(key, True)
+
+        if self._bloom is not None:
+            with self._lock:
+                self._rotate()
+                self._bloom.add(key)
+
+    def is_duplicate(self, object: dict, headers=None) -> bool:
+        """
+        Returns true if the activity ID of `object` from its actor, or the
+        Signature in `headers`, has been recorded before.
+        """
+        self.checks += 1
+
+        for key in self._keys(object, headers):
+            if self.seen(key):
+                self.duplicates += 1
+                return True
+
+        return False
+
+    def record(self, object: dict, headers=None) -> None:
+        """
+        Remember the activity ID of `object` from its actor, and the
+        Signature in `headers`.
+        """
+        for key in self._keys(object, headers):
+            self.add(key)
+
+    def _keys(self, object: dict, headers):
+        if isinstance(object, dict) and isinstance(object.get("id"), str):
+            actor = object.get("actor")
+            if isinstance(actor, dict):
+                actor = actor.get("id")
+            yield f"id:{actor} {object['id']}"
+
+        if headers is not None and not isinstance(headers, Headers):
+            headers = Headers(headers)
+
+        signature = headers.get("signature") if headers is not None else None
+        if signature is not None:
+            yield f"signature:{signature.raw_value}"
+
+    def _rotate(self) -> None:
+        now = time.monotonic()
+
+        if now - self._bloom_started > self.ttl:
+            self._previous_bloom = self._bloom
+            self._bloom = BloomFilter(self.bloom_capacity, self.error_rate)
+            self._bloom_started = now
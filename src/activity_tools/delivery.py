@@ -0,0 +1,184 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlparse
+
+from .headers import ContentTypes, Signer
+from .transport import get_transport, TransportError
+from .breaker import circuit_breaker
+from . import metrics
+
+class DeliveryResult:
+    """
+    The outcome of one POST to a remote inbox.
+    """
+
+    inbox: str
+    """ The inbox the activity was posted to """
+
+    recipients: list
+    """ The recipients served by this inbox, more than one for a sharedInbox """
+
+    status: int
+    """ The HTTP status code, or `None` if the request failed """
+
+    error: str
+    """ A description of the error, or `None` """
+
+    def __init__(self, inbox, recipients, status=None, error=None) -> None:
+        self.inbox = inbox
+        self.recipients = recipients
+        self.status = status
+        self.error = error
+
+    @property
+    def ok(self) -> bool:
+        """ True if the remote accepted the activity """
+        return self.status is not None and 200 <= self.status < 300
+
+def collapse_inboxes(recipients: list) -> dict:
+    """
+    Group recipients by the inbox we need to post to. A recipient can be an
+    inbox URL, an `Actor` or an actor document as a dict. Actors that
+    announce a sharedInbox are collapsed on to it. Returns a dict that maps
+    each inbox URL to the recipients it serves.
+    """
+    targets = {}
+
+    for recipient in recipients:
+        if isinstance(recipient, str):
+            inbox = recipient
+        else:
+            document = recipient if isinstance(recipient, dict) else recipient.actor_raw
+            endpoints = document.get("endpoints") or {}
+            inbox = endpoints.get("sharedInbox") or document["inbox"]
+
+        targets.setdefault(inbox, []).append(recipient)
+
+    return targets
+
+class Delivery:
+    """
+    Fan-out delivery of activities to remote inboxes. Requests are posted
+    concurrently, limited both in total and per host, over the keep-alive
+    connections of the shared transport, see `get_transport`.
+
+    ```python
+    Example:
+        delivery = Delivery(Signer(key, "https://example.com/users/foo#main-key"))
+        results = await delivery.deliver(create.run(), followers)
+        failed = [r for r in results if not r.ok]
+    ```
+    """
+
+    def __init__(
+            self,
+            signer: Signer,
+            concurrency: int = 64,
+            per_host: int = 4,
+            timeout = None,
+            sign_workers: int = None
+        ) -> None:
+
+        """
+        Create a delivery engine that signs requests with `signer`. At most
+        `concurrency` requests are in flight, and at most `per_host` to a
+        single host. The `timeout` is a (connect, read) tuple in seconds,
+        by default the timeout of the transport is used, see `get_transport`.
+
+        The activity is serialized and digested once per delivery. With
+        `sign_workers`, all requests are signed up front in that many
+        processes, see `Signer.sign_many`. Otherwise each request is signed
+        just before it is posted.
+        """
+        self.signer = signer
+        self.concurrency = concurrency
+        self.per_host = per_host
+        self.timeout = timeout
+        self.sign_workers = sign_workers
+
+        self._executor = ThreadPoolExecutor(max_workers=concurrency)
+
+    async def deliver(self, activity, recipients: list) -> list:
+        """
+        Sign and post `activity` to all `recipients`, see `collapse_inboxes`.
+        Returns a list of `DeliveryResult`, one per inbox.
+        """
+        targets = collapse_inboxes(recipients)
+        prepared = self.signer.prepare(activity)
+        signed = {}
+
+        if self.sign_workers and targets:
+            _, signed = await asyncio.to_thread(
+                self.signer.sign_many, list(targets), prepared, max_workers=self.sign_workers
+            )
+
+        global_limit = asyncio.Semaphore(self.concurrency)
+        host_limits = {}
+
+        async def post(inbox, served):
+            host = urlparse(inbox).netloc
+            host_limit = host_limits.setdefault(host, asyncio.Semaphore(self.per_host))
+
+            # Wait for the host first, or requests queued for one busy host
+            # hold global slots and starve all other hosts
+            async with host_limit, global_limit:
+                loop = asyncio.get_running_loop()
+                return await loop.run_in_executor(
+                    self._executor, self._post, inbox, served, prepared, signed.get(inbox)
+                )
+
+        return await asyncio.gather(
+            *[post(inbox, served) for inbox, served in targets.items()]
+        )
+
+    def deliver_sync(self, activity, recipients: list) -> list:
+        """
+        Blocking version of `deliver`, for code that is not async.
+        """
+        return asyncio.run(self.deliver(activity, recipients))
+
+    def close(self) -> None:
+        """
+        Stop the worker threads. Connections belong to the transport.
+        """
+        self._executor.shutdown(wait=True)
+
+    def _post(self, inbox: str, served: list, prepared, signature: dict = None) -> DeliveryResult:
+        host = urlparse(inbox).netloc
+
+        # Signing fails locally, for example without a keyId, it says
+        # nothing about the remote and is not recorded by the breaker
+        if signature is None:
+            try:
+                _, signature = self.signer.sign(inbox, prepared)
+            except Exception as e:
+                return DeliveryResult(inbox, served, error=f"Could not sign the request to {inbox}: {e}")
+
+        # Fail fast for hosts that are down
+        if not circuit_breaker.allow(host):
+            return DeliveryResult(inbox, served, error=f"Circuit for {host} is open")
+
+        try:
+            with metrics.timer("activity_tools_deliver_seconds", "Time to post to a remote inbox", host=host):
+                resp = get_transport().post(
+                    inbox,
+                    prepared.body,
+                    headers={ **ContentTypes.activity, **signature },
+                    timeout=self.timeout
+                )
+        except TransportError as e:
+            circuit_breaker.failure(host)
+            metrics.count("activity_tools_deliver_total", "Posts to remote inboxes", host=host, status="error")
+            return DeliveryResult(inbox, served, error=str(e))
+
+        metrics.count("activity_tools_deliver_total", "Posts to remote inboxes", host=host, status=resp.status)
+
+        if resp.status >= 500:
+            circuit_breaker.failure(host)
+        else:
+            circuit_breaker.success(host)
+
+        if resp.status > 299:
+            return DeliveryResult(inbox, served, resp.status, f"Inbox {inbox} responded with a {resp.status}")
+
+        return DeliveryResult(inbox, served, resp.status)
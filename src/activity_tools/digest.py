@@ -0,0 +1,96 @@
+import re
+import hmac
+import base64
+import hashlib
+
+ALGORITHMS = {
+    "sha-256": hashlib.sha256,
+    "sha-512": hashlib.sha512,
+}
+""" Supported digest algorithms, by lower case name """
+
+# sha-256=:base64: in Content-Digest (RFC 9530)
+_CONTENT_DIGEST = re.compile(r'\s*([A-Za-z0-9-]+)\s*=\s*:([A-Za-z0-9+/=]*):\s*(?:,|$)')
+
+# SHA-256=base64 in Digest (RFC 3230)
+_DIGEST = re.compile(r'\s*([A-Za-z0-9-]+)\s*=\s*([A-Za-z0-9+/=]*)\s*(?:,|$)')
+
+def parse_digests(headers) -> dict:
+    """
+    Extract the expected digests from the Digest and Content-Digest headers.
+    Returns a dict that maps algorithm names like `sha-256` to the raw digest
+    bytes. Unsupported algorithms are ignored.
+    """
+    expected = {}
+
+    for name, pattern in (("digest", _DIGEST), ("content-digest", _CONTENT_DIGEST)):
+        header = headers.get(name)
+        if header is None:
+            continue
+
+        for algorithm, value in pattern.findall(header.raw_value):
+            algorithm = algorithm.lower()
+            if algorithm in ALGORITHMS:
+                try:
+                    expected[algorithm] = base64.b64decode(value, validate=True)
+                except ValueError:
+                    expected[algorithm] = b""
+
+    return expected
+
+class DigestVerifier:
+    """
+    Incrementally hashes a request body and compares it with the digests
+    in the request headers. Feed the body with `update()` as it arrives and
+    call `verify()` at the end.
+
+    ```python
+    Example:
+        verifier = DigestVerifier(Headers(request.headers.items()))
+        async for chunk in request.stream():
+            verifier.update(chunk)
+        if not verifier.verify():
+            ...
+    ```
+    """
+
+    def __init__(self, headers) -> None:
+        """
+        Create a verifier for the `Headers` of a request. Raises an exception
+        if the request has no supported digest.
+        """
+        self.expected = parse_digests(headers)
+
+        if not self.expected:
+            raise Exception("Request has no supported Digest or Content-Digest header")
+
+        self._hashers = { algorithm: ALGORITHMS[algorithm]() for algorithm in self.expected }
+
+    def update(self, chunk: bytes) -> None:
+        """
+        Hash the next chunk of the body.
+        """
+        for hasher in self._hashers.values():
+            hasher.update(chunk)
+
+    def verify(self) -> bool:
+        """
+        Returns true if all digests match the hashed body.
+        """
+        for algorithm, hasher in self._hashers.items():
+            if not hmac.compare_digest(hasher.digest(), self.expected[algorithm]):
+                return False
+
+        return True
+
+def verify_digest(body: bytes, headers) -> bool:
+    """
+    Returns true if `body` matches the digests in `headers`.
+    """
+    try:
+        verifier = DigestVerifier(headers)
+    except Exception:
+        return False
+
+    verifier.update(body)
+    return verifier.verify()
@@ -0,0 +1,229 @@
+import sqlite3
+import threading
+
+class FollowerStore:
+    """
+    Interface for follower storage. Each follower is stored for an owner,
+    the local actor that is followed, together with its inbox and optional
+    sharedInbox. The store keeps a deduplicated list of delivery targets
+    per owner, where followers that share an inbox are collapsed on to it.
+
+    Implement the methods below to use your own storage, or use
+    `SQLiteFollowerStore`.
+    """
+
+    def add(self, owner: str, actor_id: str, inbox: str, shared_inbox: str = None) -> None:
+        """
+        Add, or update, the follower `actor_id` of `owner`.
+        """
+        raise NotImplementedError
+
+    def remove(self, owner: str, actor_id: str) -> None:
+        """
+        Remove the follower `actor_id` of `owner`, if present.
+        """
+        raise NotImplementedError
+
+    def contains(self, owner: str, actor_id: str) -> bool:
+        """
+        Returns true if `actor_id` follows `owner`.
+        """
+        raise NotImplementedError
+
+    def count(self, owner: str) -> int:
+        """
+        Returns the number of followers of `owner`.
+        """
+        raise NotImplementedError
+
+    def fetch(self, owner: str, max_id=None, min_id=None, limit: int = 20):
+        """
+        Returns `(cursor, actor_id)` tuples, newest first, with the same
+        semantics as the `OrderedCollection` storage callback.
+        """
+        raise NotImplementedError
+
+    def delivery_targets(self, owner: str) -> list[str]:
+        """
+        Returns the deduplicated list of inboxes to deliver to, to reach all
+        followers of `owner`.
+        """
+        raise NotImplementedError
+
+    def add_actor(self, owner: str, actor) -> None:
+        """
+        Add a follower from an `Actor`, or an actor document as a dict.
+        """
+        document = actor if isinstance(actor, dict) else actor.actor_raw
+        endpoints = document.get("endpoints") or {}
+        self.add(owner, document["id"], document["inbox"], endpoints.get("sharedInbox"))
+
+    def collection(self, owner: str):
+        """
+        Returns a storage callback for `OrderedCollection`, for the followers
+        of `owner`.
+        """
+        def fetch(max_id=None, min_id=None, limit=20):
+            return self.fetch(owner, max_id, min_id, limit)
+
+        return fetch
+
+class SQLiteFollowerStore(FollowerStore):
+    """
+    Follower store backed by SQLite. Adding and removing a follower are
+    single indexed writes, and the delivery targets are kept up to date
+    with a reference count per inbox, so planning a delivery is one
+    indexed read.
+
+    ```python
+    Example:
+        followers = SQLiteFollowerStore("/var/lib/myapp/followers.db")
+        followers.add_actor(follow_object.id, follow_actor)
+        results = await delivery.deliver(create.run(), followers.delivery_targets(actor.id))
+    ```
+    """
+
+    def __init__(self, path: str) -> None:
+        """
+        Open, or create, the database at `path`.
+        """
+        self.path = path
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+
+        with self._lock:
+            if path != ":memory:":
+                self._db.execute("PRAGMA journal_mode=WAL")
+
+            self._db.executescript("""
+                CREATE TABLE IF NOT EXISTS followers (
+                    id INTEGER PRIMARY KEY,
+                    owner TEXT NOT NULL,
+                    actor TEXT NOT NULL,
+                    inbox TEXT NOT NULL,
+                    shared_inbox TEXT,
+                    target TEXT NOT NULL,
+                    UNIQUE (owner, actor)
+                );
+                CREATE TABLE IF NOT EXISTS targets (
+                    owner TEXT NOT NULL,
+                    target TEXT NOT NULL,
+                    followers INTEGER NOT NULL,
+                    PRIMARY KEY (owner, target)
+                ) WITHOUT ROWID;
+            """)
+
+    def add(self, owner: str, actor_id: str, inbox: str, shared_inbox: str = None) -> None:
+        target = shared_inbox or inbox
+
+        with self._lock, self._transaction():
+            row = self._db.execute(
+                "SELECT target FROM followers WHERE owner = ? AND actor = ?",
+                (owner, actor_id)
+            ).fetchone()
+
+            if row is None:
+                self._db.execute(
+                    "INSERT INTO followers (owner, actor, inbox, shared_inbox, target) VALUES (?, ?, ?, ?, ?)",
+                    (owner, actor_id, inbox, shared_inbox, target)
+                )
+            else:
+                self._db.execute(
+                    "UPDATE followers SET inbox = ?, shared_inbox = ?, target = ? WHERE owner = ? AND actor = ?",
+                    (inbox, shared_inbox, target, owner, actor_id)
+                )
+
+                if row[0] == target:
+                    return
+
+                self._release_target(owner, row[0])
+
+            self._db.execute(
+                "INSERT INTO targets (owner, target, followers) VALUES (?, ?, 1) "
+                "ON CONFLICT (owner, target) DO UPDATE SET followers = followers + 1",
+                (owner, target)
+            )
+
+    def remove(self, owner: str, actor_id: str) -> None:
+        with self._lock, self._transaction():
+            row = self._db.execute(
+                "SELECT target FROM followers WHERE owner = ? AND actor = ?",
+                (owner, actor_id)
+            ).fetchone()
+
+            if row is not None:
+                self._db.execute(
+                    "DELETE FROM followers WHERE owner = ? AND actor = ?",
+                    (owner, actor_id)
+                )
+                self._release_target(owner, row[0])
+
+    def contains(self, owner: str, actor_id: str) -> bool:
+        with self._lock:
+            row = self._db.execute(
+                "SELECT 1 FROM followers WHERE owner = ? AND actor = ?",
+                (owner, actor_id)
+            ).fetchone()
+
+        return row is not None
+
+    def count(self, owner: str) -> int:
+        with self._lock:
+            return self._db.execute(
+                "SELECT COUNT(*) FROM followers WHERE owner = ?", (owner,)
+            ).fetchone()[0]
+
+    def fetch(self, owner: str, max_id=None, min_id=None, limit: int = 20):
+        with self._lock:
+            if min_id is not None:
+                rows = self._db.execute(
+                    "SELECT id, actor FROM followers WHERE owner = ? AND id > ? ORDER BY id ASC LIMIT ?",
+                    (owner, int(min_id), limit)
+                ).fetchall()
+                rows.reverse()
+            else:
+                rows = self._db.execute(
+                    "SELECT id, actor FROM followers WHERE owner = ? AND id < ? ORDER BY id DESC LIMIT ?",
+                    (owner, int(max_id) if max_id is not None else 2 ** 63 - 1, limit)
+                ).fetchall()
+
+        return rows
+
+    def delivery_targets(self, owner: str) -> list[str]:
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT target FROM targets WHERE owner = ?", (owner,)
+            ).fetchall()
+
+        return [row[0] for row in rows]
+
+    def close(self) -> None:
+        """
+        Close the database.
+        """
+        with self._lock:
+            self._db.close()
+
+    def _release_target(self, owner: str, target: str) -> None:
+        self._db.execute(
+            "UPDATE targets SET followers = followers - 1 WHERE owner = ? AND target = ?",
+            (owner, target)
+        )
+        self._db.execute(
+            "DELETE FROM targets WHERE owner = ? AND target = ? AND followers <= 0",
+            (owner, target)
+        )
+
+    def _transaction(self):
+        return _Transaction(self._db)
+
+class _Transaction:
+
+    def __init__(self, db) -> None:
+        self.db = db
+
+    def __enter__(self):
+        self.db.execute("BEGIN IMMEDIATE")
+
+    def __exit__(self, exc_type, exc, tb):
+        self.db.execute("ROLLBACK" if exc_type else "COMMIT")
@@ -1,18 +1,21 @@
+import os
 import re
+import time
 import base64
 import hashlib
 import json
+from functools import lru_cache
 from typing import Tuple
-from datetime import datetime
 from urllib.parse import urlparse
 
-from cryptography.hazmat.primitives import hashes, serialization
-from cryptography.hazmat.primitives.asymmetric import padding
-from cryptography.hazmat.backends import default_backend
+# cryptography and the process pool are imported on first use, so building
+# documents does not pay for them
 
-from cryptography.exceptions import InvalidSignature
-
-from .objects import Actor, InboxObject
+from .keys import key_store
+from .cache import TTLCache
+from .digest import DigestVerifier
+from .crypto import key_type, sign_message, verify_message
+from . import codec, metrics
 
 class ContentTypes:
 
@@ -30,29 +33,138 @@ class ContentTypes:
             'Content-Type': "application/jrd+json"
         }
 
+# One key="quoted value" or key=token parameter with the separating comma,
+# anything else is captured by the last group and makes the header invalid.
+_SIGNATURE_PARAM = re.compile(
+    r'\s*([A-Za-z][A-Za-z0-9_.-]*)\s*=\s*(?:"([^"]*)"|([^",\s]*))\s*(?:,|$)|(.)',
+    re.DOTALL
+)
+
 class SignatureHeader:
+    """
+    Parsed value of a Signature header as defined in draft-cavage HTTP
+    Signatures. The header is parsed in a single pass, quoted values may
+    contain commas and unknown parameters are kept in `params`.
+    """
+
+    __slots__ = ("key_id", "algorithm", "headers", "signature", "created", "expires", "params")
 
     key_id: str
     algorithm: str
     headers: list
     signature: str
 
+    created: int
+    """ The (created) parameter as a unix timestamp, or `None` """
+
+    expires: int
+    """ The (expires) parameter as a unix timestamp, or `None` """
+
+    params: dict
+    """ All parameters, with lower case names """
+
     def __init__(self, header) -> None:
-        for sh in header.split(","):
-            m = re.match(r'^"?([^"]+)"?="?([^"]+)"?$', sh)
-            key = m.group(1)
-            value = m.group(2)
-
-            if key.lower() == "keyid":
-                self.key_id = value
-            elif key.lower() == "algorithm":
-                self.algorithm = value
-            elif key.lower() == "headers":
-                self.headers = value.split(" ")
-            elif key.lower() == "signature":
-                self.signature = value
-            else:
-                raise Exception("Unsupported SignatureHeader key")
+        self.params = {}
+
+        for key, quoted, token, invalid in _SIGNATURE_PARAM.findall(header.strip()):
+            if invalid:
+                raise Exception("Malformed Signature header")
+
+            self.params[key.lower()] = quoted or token
+
+        if "keyid" not in self.params or "signature" not in self.params:
+            raise Exception("Signature header is missing keyId or signature")
+
+        self.key_id = self.params["keyid"]
+        self.algorithm = self.params.get("algorithm")
+        self.signature = self.params["signature"]
+
+        # Defaults to the Date header when headers is not specified
+        self.headers = self.params.get("headers", "date").split()
+
+        self.created = int(self.params["created"]) if "created" in self.params else None
+        self.expires = int(self.params["expires"]) if "expires" in self.params else None
+
+# One label=("component" ...);param=value member of Signature-Input, and one
+# label=:base64: member of Signature. Anything else is captured by the last
+# group and makes the header invalid.
+_SIGNATURE_INPUT_MEMBER = re.compile(
+    r'\s*([a-z*][a-z0-9_.*-]*)=(\(([^()]*)\)((?:;[a-z*][a-z0-9_.*-]*(?:=(?:"[^"]*"|[^,;\s"]*))?)*))\s*(?:,|$)|(.)',
+    re.DOTALL
+)
+_SIGNATURE_MEMBER = re.compile(r'\s*([a-z*][a-z0-9_.*-]*)=:([A-Za-z0-9+/=]*):[^,]*(?:,|$)|(.)', re.DOTALL)
+_COMPONENT = re.compile(r'\s*"([^"]*)"(?=\s|$)|(.)', re.DOTALL)
+_SIGNATURE_PARAMETER = re.compile(r';([a-z*][a-z0-9_.*-]*)(?:=(?:"([^"]*)"|([^,;\s"]*)))?')
+
+class MessageSignature:
+    """
+    One signature from the Signature-Input and Signature headers, as defined
+    in RFC 9421 HTTP Message Signatures. It has the same fields as
+    `SignatureHeader`, `headers` lists the covered components, for example
+    `@method` and `content-digest`.
+    """
+
+    __slots__ = (
+        "label", "key_id", "algorithm", "headers", "signature",
+        "created", "expires", "params", "signature_params"
+    )
+
+    label: str
+    """ The signature label, for example `sig1` """
+
+    signature_params: str
+    """ The serialized components and parameters, as signed in `@signature-params` """
+
+    def __init__(self, label: str, signature_params: str, components: str, params: str, signature: str) -> None:
+        self.label = label
+        self.signature_params = signature_params
+        self.signature = signature
+        self.headers = []
+
+        for component, invalid in _COMPONENT.findall(components):
+            if invalid:
+                raise Exception("Unsupported component in Signature-Input")
+            self.headers.append(component)
+
+        self.params = {
+            name: quoted or token or True
+            for name, quoted, token in _SIGNATURE_PARAMETER.findall(params)
+        }
+
+        if not isinstance(self.params.get("keyid"), str):
+            raise Exception("Signature-Input is missing keyid")
+
+        self.key_id = self.params["keyid"]
+        self.algorithm = self.params.get("alg")
+        self.created = int(self.params["created"]) if "created" in self.params else None
+        self.expires = int(self.params["expires"]) if "expires" in self.params else None
+
+def parse_message_signatures(headers) -> list:
+    """
+    Parse the Signature-Input and Signature headers of a `Headers` object.
+    Returns a list of `MessageSignature`, empty if the request has no
+    RFC 9421 signatures. Raises an exception if the headers are malformed.
+    """
+    signature_input = headers.get("signature-input")
+    signature = headers.get("signature")
+
+    if signature_input is None or signature is None:
+        return []
+
+    signatures = {}
+    for label, value, invalid in _SIGNATURE_MEMBER.findall(signature.raw_value.strip()):
+        if invalid:
+            raise Exception("Malformed Signature header")
+        signatures[label] = value
+
+    parsed = []
+    for label, signature_params, components, params, invalid in _SIGNATURE_INPUT_MEMBER.findall(signature_input.raw_value.strip()):
+        if invalid:
+            raise Exception("Malformed Signature-Input header")
+        if label in signatures:
+            parsed.append(MessageSignature(label, signature_params, components, params, signatures[label]))
+
+    return parsed
 
 class Header:
     """
@@ -60,6 +172,8 @@ class Header:
     splits and parses headers like the signature header for easy use.
     """
 
+    __slots__ = ("name", "raw_value", "_parsed_value")
+
     name: str
     """ The headers name """
 
@@ -71,20 +185,21 @@ class Header:
     def __init__(self, header) -> None:
         self.name = header[0]
         self.raw_value = header[1]
-        self._parsed_value = []
-
-        if self.is_signature():
-            self._parsed_value = SignatureHeader(self.raw_value)
-        else:
-            self._parsed_value = self.raw_value
+        self._parsed_value = None
 
     @property
     def value(self):
         """ 
         Parsed header value. Most headers are just strings, but
         special headers like the signature header will return a
-        SignatureHeader object.
+        SignatureHeader object. The value is parsed on first access.
         """
+        if self._parsed_value is None:
+            if self.is_signature():
+                self._parsed_value = SignatureHeader(self.raw_value)
+            else:
+                self._parsed_value = self.raw_value
+
         return self._parsed_value
 
     def is_signature(self) -> bool:
@@ -94,19 +209,29 @@ class Header:
         return self.name.lower() == "signature"
 
 class Headers:
+    """
+    Case insensitive index of HTTP headers, built once. Repeated headers
+    are combined in to one comma separated value.
+    """
+
+    __slots__ = ("headers",)
 
-    headers: list[Header]
+    headers: dict[str, Header]
 
     def __init__(self, headers) -> None:
-        self.headers = []
+        self.headers = {}
 
-        for header in headers:
-            self.headers.append(Header(header))
+        for name, value in headers:
+            key = name.lower()
+            header = self.headers.get(key)
+
+            if header is None:
+                self.headers[key] = Header((name, value))
+            else:
+                self.headers[key] = Header((header.name, f"{header.raw_value}, {value}"))
 
     def get(self, name):
-        for header in self.headers:
-            if header.name.lower() == name:
-                return header
+        return self.headers.get(name.lower())
 
 def verify_signature(
         object: dict,
@@ -122,92 +247,721 @@ def verify_signature(
     arguments:
     - object     - A dict representing the object we like to verify
     - headers    - A list of tuples of strings representing our HTTP headers
+    - inbox_path - The path to our inbox, eg. /users/foo/inbox. For RFC 9421
+                   signatures the full URL is used, it defaults to https and
+                   the Host header, pass the full URL if that is not correct.
+
+    Both RFC 9421 signatures, with the Signature-Input header, and
+    draft-cavage signatures are verified, with RSA or Ed25519 keys.
+    """
+
+    _, signature_header, signature, message = _parse_signed_request(headers, inbox_path)
+
+    return _verify_parsed(object, signature_header, signature, message)
+
+def _verify_parsed(object: dict, signature_header, signature: bytes, message: bytes) -> bool:
+    if _is_expired(signature_header):
+        return False
+
+    # Resolve the senders public key by the keyId in the signature header
+    remote_key = key_store.get(signature_header.key_id)
+
+    if _verify_with_key(remote_key, object, signature, message, signature_header.algorithm):
+        return True
+
+    # The remote may have rotated its key, fetch it again and retry once
+    remote_key = key_store.get(signature_header.key_id, refresh=True)
+
+    return _verify_with_key(remote_key, object, signature, message, signature_header.algorithm)
+
+async def verify_signature_async(
+        object: dict,
+        headers: list[Tuple[str, str]],
+        inbox_path: str
+    ) -> bool:
+
+    """
+    Coroutine version of `verify_signature`. Keys are resolved without
+    blocking the event loop, and share the key store with `verify_signature`.
+    """
+
+    _, signature_header, signature, message = _parse_signed_request(headers, inbox_path)
+
+    return await _verify_parsed_async(object, signature_header, signature, message)
+
+async def _verify_parsed_async(object: dict, signature_header, signature: bytes, message: bytes) -> bool:
+    if _is_expired(signature_header):
+        return False
+
+    remote_key = await key_store.get_async(signature_header.key_id)
+
+    if _verify_with_key(remote_key, object, signature, message, signature_header.algorithm):
+        return True
+
+    remote_key = await key_store.get_async(signature_header.key_id, refresh=True)
+
+    return _verify_with_key(remote_key, object, signature, message, signature_header.algorithm)
+
+MAX_BODY_SIZE = 1024 * 1024
+""" Default limit, in bytes, for request bodies passed to `verify_request` """
+
+def verify_request(
+        body: bytes,
+        headers: list[Tuple[str, str]],
+        inbox_path: str,
+        max_size: int = MAX_BODY_SIZE,
+        duplicates = None
+    ) -> dict:
+
+    """
+    Verify an incoming request from the raw body bytes. The body is checked
+    against the Digest or Content-Digest header before it is parsed as JSON
+    and before any keys are fetched, then the signature is verified. Returns
+    the parsed object, or `None` if the request could not be verified.
+
+    arguments:
+    - body       - The raw request body
+    - headers    - A list of tuples of strings representing our HTTP headers
     - inbox_path - The path to our inbox, eg. /users/foo/inbox
+    - max_size   - Larger bodies are rejected
+    - duplicates - An optional `DuplicateFilter`, activities it has seen are
+                   rejected before the signature is verified. The activity
+                   is not recorded, call `duplicates.record(object, headers)`
+                   once it has been handled, so a failed attempt can be
+                   retried.
+    """
+
+    if len(body) > max_size:
+        return None
+
+    headers_obj, verifier = _digest_verifier(headers)
+    if verifier is None:
+        return None
+
+    verifier.update(body)
+
+    if not verifier.verify():
+        return None
+
+    # A malformed signature, or a signed header that is missing
+    try:
+        _, signature_header, signature, message = _parse_signed_request(headers_obj, inbox_path)
+    except Exception:
+        return None
+
+    try:
+        object = codec.loads(body, max_size=max_size)
+    except ValueError:
+        return None
+
+    if duplicates is not None and duplicates.is_duplicate(object, headers_obj):
+        return None
+
+    if not _verify_parsed(object, signature_header, signature, message):
+        return None
+
+    return object
+
+async def verify_request_async(
+        stream,
+        headers: list[Tuple[str, str]],
+        inbox_path: str,
+        max_size: int = MAX_BODY_SIZE,
+        duplicates = None
+    ) -> dict:
+
+    """
+    Coroutine version of `verify_request`. The body is read from the async
+    iterator `stream`, for example Starlette's `request.stream()`, and hashed
+    as it arrives. Reading stops as soon as the body exceeds `max_size`.
+    """
+
+    headers_obj, verifier = _digest_verifier(headers)
+    if verifier is None:
+        return None
+
+    chunks = []
+    size = 0
+
+    async for chunk in stream:
+        size += len(chunk)
+        if size > max_size:
+            return None
+
+        verifier.update(chunk)
+        chunks.append(chunk)
+
+    body = b"".join(chunks)
+
+    if not verifier.verify():
+        return None
+
+    try:
+        _, signature_header, signature, message = _parse_signed_request(headers_obj, inbox_path)
+    except Exception:
+        return None
+
+    try:
+        object = codec.loads(body, max_size=max_size)
+    except ValueError:
+        return None
+
+    if duplicates is not None and duplicates.is_duplicate(object, headers_obj):
+        return None
+
+    if not await _verify_parsed_async(object, signature_header, signature, message):
+        return None
+
+    return object
+
+def _digest_verifier(headers):
+    headers_obj = headers if isinstance(headers, Headers) else Headers(headers)
+
+    # The digest must be covered by the signature, or it proves nothing
+    if headers_obj.get('signature') is None:
+        return headers_obj, None
+
+    try:
+        signed = _signature_params(headers_obj).headers
+        verifier = DigestVerifier(headers_obj)
+    except Exception:
+        return headers_obj, None
+
+    if "digest" not in signed and "content-digest" not in signed:
+        return headers_obj, None
+
+    return headers_obj, verifier
+
+def verify_signatures(
+        requests: list[Tuple[list, dict, str]],
+        max_workers: int = None,
+        max_size: int = MAX_BODY_SIZE,
+        executor = None
+    ) -> list[bool]:
+
+    """
+    Verify many requests at once, for example when an inbox queue is replayed.
+    Keys are resolved once per distinct keyId, and the RSA verifications are
+    spread over a pool of worker processes. Returns a list of booleans in the
+    same order as `requests`.
+
+    arguments:
+    - requests    - A list of (headers, object, inbox_path) tuples, see
+                    `verify_signature`. The object may also be the raw JSON
+                    body, it is then checked like in `verify_request`: the
+                    signature must cover the digest, the digest must match
+                    and the body must not be larger than `max_size`.
+    - max_workers - Number of worker processes, defaults to the number of CPUs
+    - executor    - An optional `ProcessPoolExecutor` to verify in, by default
+                    a pool is started for the call
     """
 
+    parsed = []
+    for headers, object, inbox_path in requests:
+        try:
+            headers_obj = headers if isinstance(headers, Headers) else Headers(headers)
+
+            if isinstance(object, (bytes, str)):
+                object = _verified_body(object, headers_obj, max_size)
+                if object is None:
+                    parsed.append(None)
+                    continue
+
+            _, signature_header, signature, message = _parse_signed_request(headers_obj, inbox_path)
+            if _is_expired(signature_header):
+                parsed.append(None)
+            else:
+                parsed.append((object, signature_header.key_id, signature, message, signature_header.algorithm))
+        except Exception:
+            parsed.append(None)
+
+    max_workers = max_workers or os.cpu_count() or 1
+    pool = executor
+
+    try:
+        def get_pool():
+            nonlocal pool
+            if pool is None:
+                from concurrent.futures import ProcessPoolExecutor
+
+                pool = ProcessPoolExecutor(max_workers=max_workers)
+            return pool
+
+        results = _verify_batch(parsed, _resolve_keys(parsed), max_workers, get_pool)
+
+        # The remote may have rotated its key, refresh the keys that failed and retry once
+        failed = [i for i, ok in enumerate(results) if not ok and parsed[i] is not None]
+        refreshed = _resolve_keys([parsed[i] for i in failed], refresh=True)
+
+        if refreshed:
+            retry = [parsed[i] if parsed[i][1] in refreshed else None for i in failed]
+            for i, ok in zip(failed, _verify_batch(retry, refreshed, max_workers, get_pool)):
+                results[i] = ok
+    finally:
+        # Only shut down a pool that was started for this call
+        if pool is not None and pool is not executor:
+            pool.shutdown()
+
+    return results
+
+def _verified_body(body, headers_obj: Headers, max_size: int) -> dict:
+    # The checks of verify_request for a raw body, returns None if they fail
+    if isinstance(body, str):
+        body = body.encode("utf-8")
+
+    if len(body) > max_size:
+        return None
+
+    _, verifier = _digest_verifier(headers_obj)
+    if verifier is None:
+        return None
+
+    verifier.update(body)
+
+    if not verifier.verify():
+        return None
+
+    return codec.loads(body, max_size=max_size)
+
+def _resolve_keys(parsed: list, refresh: bool = False) -> dict:
+    keys = {}
+
+    for item in parsed:
+        if item is None or item[1] in keys:
+            continue
+
+        try:
+            remote_key = key_store.get(item[1], refresh=refresh)
+        except Exception:
+            remote_key = None
+
+        keys[item[1]] = remote_key
+
+    return { key_id: k for key_id, k in keys.items() if k is not None }
+
+def _verify_batch(parsed: list, keys: dict, max_workers: int, get_pool) -> list[bool]:
+    results = [False] * len(parsed)
+    der_keys = {}
+    jobs = []
+
+    for i, item in enumerate(parsed):
+        if item is None:
+            continue
+
+        object, key_id, signature, message, algorithm = item
+        remote_key = keys.get(key_id)
+
+        if remote_key is None or remote_key.owner != object.get('actor'):
+            continue
+
+        if key_id not in der_keys:
+            from cryptography.hazmat.primitives import serialization
+
+            der_keys[key_id] = remote_key.key.public_bytes(
+                serialization.Encoding.DER,
+                serialization.PublicFormat.SubjectPublicKeyInfo
+            )
+
+        jobs.append((i, der_keys[key_id], signature, message, algorithm))
+
+    if not jobs:
+        return results
+
+    chunksize = max(1, len(jobs) // (4 * max_workers))
+    verified = get_pool().map(_verify_der, [job[1:] for job in jobs], chunksize=chunksize)
+
+    for job, ok in zip(jobs, verified):
+        results[job[0]] = ok
+
+    return results
+
+@lru_cache(maxsize=1024)
+def _load_der_public_key(der: bytes):
+    from cryptography.hazmat.primitives import serialization
+
+    return serialization.load_der_public_key(der)
+
+def _verify_der(job: Tuple[bytes, bytes, bytes, str]) -> bool:
+    # Runs in the worker processes, parsed keys are cached per process
+    der, signature, message, algorithm = job
+    return _verify(_load_der_public_key(der), signature, message, algorithm)
+
+def _signature_params(headers_obj: Headers):
+    # RFC 9421 when there is a Signature-Input header, else draft-cavage
+    if headers_obj.get('signature-input') is not None:
+        signatures = parse_message_signatures(headers_obj)
+        if not signatures:
+            raise Exception("Signature-Input has no matching Signature")
+        return signatures[0]
+
+    return headers_obj.get('signature').value
+
+def _parse_signed_request(headers, inbox_path: str):
     # Analyze headers
-    headers_obj = Headers(headers)
+    headers_obj = headers if isinstance(headers, Headers) else Headers(headers)
 
     # The extract the value of the signature header
-    signature_header: SignatureHeader = headers_obj.get('signature').value
+    signature_header = _signature_params(headers_obj)
 
     # Extract the signature, confusually another header with the same name
     # inside the signature header. Decode the signature.
     signature = base64.b64decode(signature_header.signature)
 
-    # Fetch the remote actors, actor
-    actor = Actor.fetch(actor_url=object['actor'])
+    if isinstance(signature_header, MessageSignature):
+        message = _signature_base(signature_header, headers_obj, inbox_path)
+        return headers_obj, signature_header, signature, message
+
+    if "://" in inbox_path:
+        inbox_path = urlparse(inbox_path).path
 
     message = []
     for h in signature_header.headers:
         if h == '(request-target)':
             message.append(f"(request-target): post {inbox_path}")
+        elif h == '(created)':
+            message.append(f"(created): {signature_header.created}")
+        elif h == '(expires)':
+            message.append(f"(expires): {signature_header.expires}")
         else:
-            message.append(f"{h}: {headers_obj.get(h).raw_value}")
+            header = headers_obj.get(h)
+            if header is None:
+                raise Exception(f"Signed header {h} is missing")
+            message.append(f"{h}: {header.raw_value}")
 
     message = "\n".join(message).encode("utf-8")
 
-    try:
-        actor.get_public_key().verify(
-            signature, message, padding.PKCS1v15(), hashes.SHA256()
-        )
-    except InvalidSignature:
+    return headers_obj, signature_header, signature, message
+
+def _signature_base(signature_header: MessageSignature, headers_obj: Headers, inbox_path: str) -> bytes:
+    # The signature base of RFC 9421, section 2.5. The target URI is built
+    # from the Host header unless the full URL is passed as inbox_path.
+    if "://" in inbox_path:
+        target_uri = inbox_path
+    else:
+        host = headers_obj.get('host')
+        if host is None:
+            raise Exception("Signed request has no Host header")
+        target_uri = f"https://{host.raw_value}{inbox_path}"
+
+    target = urlparse(target_uri)
+    components = {
+        "@method": "POST",
+        "@target-uri": target_uri,
+        "@authority": target.netloc.lower(),
+        "@scheme": target.scheme,
+        "@path": target.path,
+        "@query": f"?{target.query}",
+        "@request-target": f"{target.path}?{target.query}" if target.query else target.path,
+    }
+
+    lines = []
+    for component in signature_header.headers:
+        if component in components:
+            value = components[component]
+        else:
+            header = headers_obj.get(component)
+            if header is None:
+                raise Exception(f"Signed component {component} is missing")
+            value = header.raw_value.strip()
+
+        lines.append(f'"{component}": {value}')
+
+    lines.append(f'"@signature-params": {signature_header.signature_params}')
+
+    return "\n".join(lines).encode("utf-8")
+
+def _is_expired(signature_header: SignatureHeader) -> bool:
+    return signature_header.expires is not None and signature_header.expires < time.time()
+
+def _verify_with_key(remote_key, object: dict, signature: bytes, message: bytes, algorithm: str = None) -> bool:
+    # The key must belong to the actor that sent the message
+    if remote_key is None or remote_key.owner != object.get('actor'):
         return False
 
-    return True
+    return _verify(remote_key.key, signature, message, algorithm)
 
-def make_signature(remote_inbox: str, message: str, sender_public_key_url: str):
+def _verify(public_key, signature: bytes, message: bytes, algorithm: str = None) -> bool:
+    with metrics.timer("activity_tools_verify_seconds", "Time to verify a signature"):
+        return verify_message(public_key, signature, message, algorithm)
+
+class PreparedBody:
     """
-    This function generates a signature for the specified object.
+    A request body that has been serialized and digested once, so it can be
+    signed for many inboxes, see `Signer.prepare`.
     """
 
-    # The following is to sign the HTTP request as defined in HTTP Signatures.
-    private_key_text = open('/tmp/key.pem', 'rb').read() # load from file
+    __slots__ = ("body", "digest")
 
-    private_key = serialization.load_pem_private_key(
-        private_key_text,
-        password=None,
-        backend=default_backend()
-    )
+    body: bytes
+    """ The body bytes to send """
 
-    current_date = datetime.utcnow().strftime('%a, %d %b %Y %H:%M:%S GMT')
+    digest: bytes
+    """ The base64 encoded SHA-256 digest of `body` """
 
-    recipient_parsed = urlparse(remote_inbox)
-    recipient_host = recipient_parsed.netloc
-    recipient_path = recipient_parsed.path
+    def __init__(self, body: bytes) -> None:
+        self.body = body
+        self.digest = base64.b64encode(hashlib.sha256(body).digest())
 
-    # generating digest
-    message_json = json.dumps(message)
+class Signer:
+    """
+    Signs outgoing requests as defined in HTTP Signatures. The private key is
+    parsed once when the signer is created and reused for every request.
+
+    With `format="cavage"`, the default, requests are signed as defined in
+    draft-cavage HTTP Signatures, which all servers support. With
+    `format="rfc9421"` they are signed as defined in RFC 9421 HTTP Message
+    Signatures. Ed25519 keys sign much faster than RSA keys, but few servers
+    verify them yet.
+
+    When one activity is sent to many inboxes, use `sign_many`, or `prepare`
+    the body once and pass it to `sign`. The body is then serialized and
+    digested once instead of once per inbox. Signatures are cached per
+    body, inbox and second, so retries within the same second are free.
+
+    ```python
+    Example:
+        signer = Signer(RSAKey("/my/path/key.pem"), "https://example.com/users/foo#main-key")
+        body, headers = signer.sign(remote_inbox, accept.run())
+        requests.post(remote_inbox, data=body, headers={ **ContentTypes.activity, **headers })
+
+        body, signed = signer.sign_many(inboxes, create.run())
+        for inbox, headers in signed.items():
+            requests.post(inbox, data=body, headers={ **ContentTypes.activity, **headers })
+    ```
+    """
 
-    digest = base64.b64encode(
-        hashlib.sha256(
-            message_json.__str__().encode('utf-8')
-        ).digest()
-    )
+    FORMATS = ("cavage", "rfc9421")
 
-    signature_text = b'(request-target): post %s\ndigest: SHA-256=%s\nhost: %s\ndate: %s' % (
-        recipient_path.encode('utf-8'),
-        digest,
-        recipient_host.encode('utf-8'),
-        current_date.encode('utf-8')
-    )
+    def __init__(self, key, key_id: str = None, format: str = "cavage", cache_size: int = 4096) -> None:
+        """
+        Create a signer from a `RSAKey` or `Ed25519Key`, or a private key
+        object from cryptography. The `key_id` is the URL to the public key,
+        it can also be specified per request. At most `cache_size` signatures
+        are cached.
+        """
+        if format not in self.FORMATS:
+            raise Exception(f"Unknown signature format {format}")
 
-    raw_signature = private_key.sign(
-        signature_text,
-        padding.PKCS1v15(),
-        hashes.SHA256()
-    )
+        self.private_key = getattr(key, "key", key)
+        """ The private key object from cryptography """
 
-    signature_header = 'keyId="%s",algorithm="rsa-sha256",headers="(request-target) digest host date",signature="%s"' % (
-        sender_public_key_url,
-        base64.b64encode(raw_signature).decode('utf-8')
-    )
+        self.key_type = key_type(self.private_key)
+        """ The key type, `rsa` or `ed25519` """
 
-    headers = {
-        'Date': current_date,
-        'Host': recipient_host,
-        'Digest': "SHA-256="+digest.decode('utf-8'),
-        'Signature': signature_header
-    }
+        self.key_id = key_id
+        """ The default keyId, the URL to the public key """
+
+        self.format = format
+        """ The signature format, `cavage` or `rfc9421` """
+
+        # A signature is only valid for the second in its Date header
+        self.cache = TTLCache(maxsize=cache_size, ttl=1)
+        """ Recently made signatures, keyed by body digest, keyId, inbox and second """
+
+    def prepare(self, message) -> PreparedBody:
+        """
+        Serialize and digest `message`, a dict or bytes, once so it can be
+        passed to `sign` for many inboxes.
+        """
+        if isinstance(message, PreparedBody):
+            return message
+
+        if isinstance(message, bytes):
+            return PreparedBody(message)
+
+        return PreparedBody(codec.dumps(message))
+
+    def sign(self, remote_inbox: str, message, key_id: str = None) -> Tuple[bytes, dict]:
+        """
+        Sign a POST of `message` to `remote_inbox`. The message can be a dict,
+        already serialized bytes or a `PreparedBody`. Returns the body bytes
+        to send, together with the Date, Host, Digest and Signature headers
+        that match them. RFC 9421 signatures have Content-Digest and
+        Signature-Input headers instead of Digest.
+        """
+        prepared = self.prepare(message)
+        now = int(time.time())
+
+        signature_text, make_headers, cache_key = self._signature_input(remote_inbox, prepared, key_id, now)
+        headers = self.cache.get(cache_key)
+
+        if headers is None:
+            headers = make_headers(self._sign_text(signature_text))
+            self.cache.set(cache_key, headers)
+
+        return prepared.body, dict(headers)
+
+    def sign_many(self, remote_inboxes, message, key_id: str = None, max_workers: int = None) -> Tuple[bytes, dict]:
+        """
+        Sign a POST of `message` to each of `remote_inboxes`. The body is
+        serialized and digested once. Returns the body bytes, and a dict that
+        maps each inbox to its headers, see `sign`.
+
+        With `max_workers` the signatures are made in that many worker
+        processes, this is worth it for RSA keys and thousands of inboxes.
+        """
+        prepared = self.prepare(message)
+        now = int(time.time())
+
+        signed = {}
+        pending = []
+
+        for remote_inbox in dict.fromkeys(remote_inboxes):
+            signature_text, make_headers, cache_key = self._signature_input(remote_inbox, prepared, key_id, now)
+            headers = self.cache.get(cache_key)
+
+            if headers is None:
+                pending.append((remote_inbox, signature_text, make_headers, cache_key))
+            else:
+                signed[remote_inbox] = dict(headers)
+
+        texts = [item[1] for item in pending]
+
+        if max_workers and max_workers > 1 and len(texts) > 1:
+            raw_signatures = self._sign_in_processes(texts, max_workers)
+        else:
+            raw_signatures = [self._sign_text(text) for text in texts]
+
+        for (remote_inbox, _, make_headers, cache_key), raw_signature in zip(pending, raw_signatures):
+            headers = make_headers(raw_signature)
+            self.cache.set(cache_key, headers)
+            signed[remote_inbox] = dict(headers)
+
+        return prepared.body, signed
+
+    def _sign_text(self, text: bytes) -> bytes:
+        with metrics.timer("activity_tools_sign_seconds", "Time to sign a request"):
+            return sign_message(self.private_key, text)
+
+    def _signature_input(self, remote_inbox: str, prepared: PreparedBody, key_id: str, now: int):
+        # Returns the text to sign, a function that builds the headers from
+        # the raw signature, and the cache key
+        key_id = key_id or self.key_id
+
+        if not key_id:
+            raise Exception("Signer has no keyId")
+
+        current_date = time.strftime('%a, %d %b %Y %H:%M:%S GMT', time.gmtime(now))
+
+        recipient_parsed = urlparse(remote_inbox)
+        recipient_host = recipient_parsed.netloc
+        recipient_path = recipient_parsed.path
+
+        digest = prepared.digest
+        cache_key = (digest, key_id, remote_inbox, now)
+
+        if self.format == "rfc9421":
+            return self._rfc9421_input(remote_inbox, recipient_host, current_date, digest, key_id, now) + (cache_key,)
+
+        signature_text = b'(request-target): post %s\ndigest: SHA-256=%s\nhost: %s\ndate: %s' % (
+            recipient_path.encode('utf-8'),
+            digest,
+            recipient_host.encode('utf-8'),
+            current_date.encode('utf-8')
+        )
+
+        # hs2019 means the algorithm is given by the key
+        algorithm = "rsa-sha256" if self.key_type == "rsa" else "hs2019"
+
+        def make_headers(raw_signature: bytes) -> dict:
+            signature_header = 'keyId="%s",algorithm="%s",headers="(request-target) digest host date",signature="%s"' % (
+                key_id,
+                algorithm,
+                base64.b64encode(raw_signature).decode('utf-8')
+            )
+
+            return {
+                'Date': current_date,
+                'Host': recipient_host,
+                'Digest': "SHA-256="+digest.decode('utf-8'),
+                'Signature': signature_header
+            }
+
+        return signature_text, make_headers, cache_key
+
+    def _rfc9421_input(self, remote_inbox: str, host: str, date: str, digest: bytes, key_id: str, now: int):
+        content_digest = "sha-256=:%s:" % digest.decode('utf-8')
+        algorithm = "rsa-v1_5-sha256" if self.key_type == "rsa" else "ed25519"
+
+        signature_params = '("@method" "@target-uri" "content-digest" "date");created=%d;keyid="%s";alg="%s"' % (
+            now,
+            key_id,
+            algorithm
+        )
+
+        signature_base = '"@method": POST\n"@target-uri": %s\n"content-digest": %s\n"date": %s\n"@signature-params": %s' % (
+            remote_inbox,
+            content_digest,
+            date,
+            signature_params
+        )
+
+        def make_headers(raw_signature: bytes) -> dict:
+            return {
+                'Date': date,
+                'Host': host,
+                'Content-Digest': content_digest,
+                'Signature-Input': f"sig1={signature_params}",
+                'Signature': "sig1=:%s:" % base64.b64encode(raw_signature).decode('utf-8')
+            }
+
+        return signature_base.encode('utf-8'), make_headers
+
+    def _sign_in_processes(self, texts: list, max_workers: int) -> list:
+        from concurrent.futures import ProcessPoolExecutor
+        from cryptography.hazmat.primitives import serialization
+
+        # The key is sent to each worker once, not with every text
+        pem = self.private_key.private_bytes(
+            serialization.Encoding.PEM,
+            serialization.PrivateFormat.PKCS8,
+            serialization.NoEncryption()
+        )
+        chunksize = max(1, len(texts) // (4 * max_workers))
+
+        with ProcessPoolExecutor(max_workers=max_workers, initializer=_init_sign_worker, initargs=(pem,)) as pool:
+            return list(pool.map(_sign_in_worker, texts, chunksize=chunksize))
+
+_worker_private_key = None
+
+def _init_sign_worker(pem: bytes) -> None:
+    global _worker_private_key
+    from cryptography.hazmat.primitives import serialization
+
+    _worker_private_key = serialization.load_pem_private_key(pem, password=None)
+
+def _sign_in_worker(text: bytes) -> bytes:
+    # Runs in the worker processes
+    return sign_message(_worker_private_key, text)
+
+_default_signer = None
+
+def make_signature(remote_inbox: str, message: str, sender_public_key_url: str):
+    """
+    This function generates a signature for the specified object. The private
+    key is loaded from `/tmp/key.pem` on first use. Prefer a `Signer`, it
+    returns the signed body bytes as well.
+    """
+    global _default_signer
+
+    if _default_signer is None:
+        from cryptography.hazmat.primitives import serialization
+        from cryptography.hazmat.backends import default_backend
+
+        # The following is to sign the HTTP request as defined in HTTP Signatures.
+        private_key_text = open('/tmp/key.pem', 'rb').read() # load from file
+
+        private_key = serialization.load_pem_private_key(
+            private_key_text,
+            password=None,
+            backend=default_backend()
+        )
+
+        _default_signer = Signer(private_key)
+
+    # Callers send json.dumps(message) themselves, the digest must be of
+    # exactly those bytes and not of the compact codec output
+    body = json.dumps(message).encode("utf-8")
+    _, headers = _default_signer.sign(remote_inbox, body, sender_public_key_url)
 
-    return headers    
+    return headers
@@ -1,6 +1,29 @@
-from .objects import Follow, Undo, InboxObject, Actor
+import inspect
+
+from .objects import (
+    Follow, Undo, Create, Update, Delete, Announce, Like, AcceptActivity, Reject,
+    InboxObject, Actor
+)
 
 class Inbox:
+    """
+    Parses inbox messages in to typed `InboxObject`s. The class to use is
+    looked up by the activity type in `Inbox.types`, use `Inbox.register`
+    to add or replace types.
+    """
+
+    types: dict = {
+        "follow": Follow,
+        "undo": Undo,
+        "create": Create,
+        "update": Update,
+        "delete": Delete,
+        "announce": Announce,
+        "like": Like,
+        "accept": AcceptActivity,
+        "reject": Reject,
+    }
+    """ Maps lower case activity types to `InboxObject` classes """
 
     def __init__(self, data) -> None:
         self.data = data
@@ -9,16 +32,85 @@ class Inbox:
             if not key in data:
                 raise Exception(f"Missing {key} in inbox message")
 
+    @classmethod
+    def register(cls, type_name: str, object_class) -> None:
+        """
+        Parse activities of the type `type_name` in to `object_class`, a
+        subclass of `InboxObject`.
+        """
+        cls.types[type_name.lower()] = object_class
+
     def parse(self) -> InboxObject:
-        func_name = f"type_{self.data['type'].lower()}"
+        object_class = self.types.get(self.data['type'].lower())
 
-        if not hasattr(self, func_name):
+        if object_class is None:
             raise Exception(f"Inbox message type {self.data['type']} is not implemented")
 
-        return getattr(self, func_name)()
+        return object_class(self.data)
+
+class Dispatcher:
+    """
+    Routes inbox messages to registered handlers by activity type. Messages
+    without a handler are dropped before any typed object is created.
+
+    ```python
+    Example:
+        dispatcher = Dispatcher()
+
+        @dispatcher.on("Follow")
+        async def follow(follow: Follow):
+            ...
+
+        await dispatcher.dispatch_async(body)
+    ```
+    """
+
+    def __init__(self) -> None:
+        self.handlers = {}
+        """ Maps lower case activity types to handlers """
+
+    def register(self, type_name: str, handler) -> None:
+        """
+        Call `handler` with the parsed `InboxObject` for activities of the
+        type `type_name`.
+        """
+        self.handlers[type_name.lower()] = handler
+
+    def on(self, type_name: str):
+        """
+        Decorator version of `register`.
+        """
+        def decorator(handler):
+            self.register(type_name, handler)
+            return handler
+
+        return decorator
+
+    def dispatch(self, data: dict):
+        """
+        Parse `data` and call the handler for its type. Returns whatever the
+        handler returns, or `None` if there is no handler.
+        """
+        type_name = data.get('type')
+        handler = self.handlers.get(type_name.lower()) if isinstance(type_name, str) else None
+
+        if handler is None:
+            return None
+
+        # Validate the message, types without a registered class are passed
+        # as a plain InboxObject
+        inbox = Inbox(data)
+        object_class = inbox.types.get(type_name.lower(), InboxObject)
+
+        return handler(object_class(data))
+
+    async def dispatch_async(self, data: dict):
+        """
+        Like `dispatch`, but awaits the result of coroutine handlers.
+        """
+        result = self.dispatch(data)
 
-    def type_follow(self):
-        return Follow(self.data)
+        if inspect.isawaitable(result):
+            result = await result
 
-    def type_undo(self):
-        return Undo(self.data)
+        return result
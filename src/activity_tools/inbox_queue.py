@@ -0,0 +1,306 @@
+import time
+import logging
+import sqlite3
+import threading
+
+from .headers import Headers, MAX_BODY_SIZE
+from . import codec, metrics
+
+logger = logging.getLogger(__name__)
+
+class QueuedRequest:
+    """
+    An inbox request taken from the queue by a worker.
+    """
+
+    id: int
+    """ The queue ID """
+
+    body: bytes
+    """ The raw request body """
+
+    headers: list
+    """ The request headers as a list of (name, value) tuples """
+
+    path: str
+    """ The inbox path the request was posted to """
+
+    attempts: int
+    """ Number of times this request has been handed to a worker, including this one """
+
+    def __init__(self, id, body, headers, path, attempts) -> None:
+        self.id = id
+        self.body = body
+        self.headers = headers
+        self.path = path
+        self.attempts = attempts
+
+class InboxQueue:
+    """
+    A durable inbox queue backed by SQLite. The request handler only does
+    cheap validation and appends the request with `accept()`, then responds
+    with 202. A pool of worker threads verifies and processes the requests.
+
+    Requests are leased to a worker while it runs. A request is removed
+    when the handler returns, and retried with a backoff if it raises. If a
+    process dies the lease expires and another worker picks up the request,
+    so each request is handled at least once.
+
+    ```python
+    Example:
+        queue = InboxQueue("/var/lib/myapp/inbox.db")
+
+        def handle(request: QueuedRequest):
+            body = verify_request(request.body, request.headers, request.path)
+            if body is not None:
+                dispatcher.dispatch(body)
+
+        queue.start(handle, workers=4)
+
+        # In the inbox POST handler
+        if not await queue.accept_stream(request.stream(), request.headers.items(), request.url.path):
+            return Response(status_code=400)
+        return Response(status_code=202)
+    ```
+    """
+
+    def __init__(
+            self,
+            path: str,
+            max_body_size: int = MAX_BODY_SIZE,
+            lease: float = 300,
+            max_attempts: int = 5,
+            retry_delay: float = 30
+        ) -> None:
+
+        """
+        Open, or create, the queue at `path`. Requests larger than
+        `max_body_size` are not accepted. A worker has `lease` seconds to
+        handle a request before it is handed to another worker. Failed
+        requests are retried after `retry_delay` seconds, doubled for each
+        attempt, and are kept as dead after `max_attempts` attempts.
+        """
+        self.path = path
+        self.max_body_size = max_body_size
+        self.lease = lease
+        self.max_attempts = max_attempts
+        self.retry_delay = retry_delay
+
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._stopping = threading.Event()
+        self._workers = []
+
+        self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None, timeout=30)
+
+        with self._lock:
+            if path != ":memory:":
+                self._db.execute("PRAGMA journal_mode=WAL")
+
+            self._db.executescript("""
+                CREATE TABLE IF NOT EXISTS inbox (
+                    id INTEGER PRIMARY KEY,
+                    body BLOB NOT NULL,
+                    headers TEXT NOT NULL,
+                    path TEXT NOT NULL,
+                    received REAL NOT NULL,
+                    available_at REAL NOT NULL,
+                    lease_until REAL,
+                    attempts INTEGER NOT NULL DEFAULT 0,
+                    dead INTEGER NOT NULL DEFAULT 0
+                );
+                CREATE INDEX IF NOT EXISTS inbox_available ON inbox (dead, available_at);
+            """)
+
+        metrics.registry.gauge("activity_tools_inbox_queue_depth", "Requests waiting in the inbox queue", self.depth)
+
+    def accept(self, body: bytes, headers, path: str) -> bool:
+        """
+        Validate a request cheaply and enqueue it. Returns false if the
+        request is too large or is not signed, it is then not queued.
+        """
+        if len(body) > self.max_body_size:
+            return False
+
+        headers = list(headers)
+
+        if not _is_signed(headers):
+            return False
+
+        self.enqueue(body, headers, path)
+        return True
+
+    async def accept_stream(self, stream, headers, path: str) -> bool:
+        """
+        Like `accept`, but the body is read from the async iterator `stream`,
+        for example Starlette's `request.stream()`. The headers are checked
+        first, and reading stops as soon as the body exceeds `max_body_size`.
+        """
+        headers = list(headers)
+
+        if not _is_signed(headers):
+            return False
+
+        chunks = []
+        size = 0
+
+        async for chunk in stream:
+            size += len(chunk)
+            if size > self.max_body_size:
+                return False
+            chunks.append(chunk)
+
+        self.enqueue(b"".join(chunks), headers, path)
+        return True
+
+    def enqueue(self, body: bytes, headers, path: str) -> int:
+        """
+        Append a request to the queue without validation. The request is
+        committed to disk when this returns. Returns the queue ID.
+        """
+        now = time.time()
+
+        with self._lock:
+            cursor = self._db.execute(
+                "INSERT INTO inbox (body, headers, path, received, available_at) VALUES (?, ?, ?, ?, ?)",
+                (body, codec.dumps(list(headers)).decode("utf-8"), path, now, now)
+            )
+
+        self._wakeup.set()
+        return cursor.lastrowid
+
+    def claim(self) -> QueuedRequest:
+        """
+        Lease the oldest available request to the caller. Returns `None` if
+        the queue is empty.
+        """
+        now = time.time()
+
+        # SELECT and UPDATE in one write transaction, so two processes can
+        # not lease the same request. UPDATE ... RETURNING would need
+        # SQLite 3.35.
+        with self._lock:
+            self._db.execute("BEGIN IMMEDIATE")
+
+            try:
+                row = self._db.execute(
+                    """
+                    SELECT id, body, headers, path, attempts FROM inbox
+                    WHERE dead = 0 AND available_at <= ? AND (lease_until IS NULL OR lease_until < ?)
+                    ORDER BY id LIMIT 1
+                    """,
+                    (now, now)
+                ).fetchone()
+
+                if row is not None:
+                    self._db.execute(
+                        "UPDATE inbox SET lease_until = ?, attempts = attempts + 1 WHERE id = ?",
+                        (now + self.lease, row[0])
+                    )
+            except BaseException:
+                self._db.execute("ROLLBACK")
+                raise
+
+            self._db.execute("COMMIT")
+
+        if row is None:
+            return None
+
+        headers = [tuple(header) for header in codec.loads(row[2], max_size=None)]
+        return QueuedRequest(row[0], row[1], headers, row[3], row[4] + 1)
+
+    def complete(self, request: QueuedRequest) -> None:
+        """
+        Remove a handled request from the queue.
+        """
+        with self._lock:
+            self._db.execute("DELETE FROM inbox WHERE id = ?", (request.id,))
+
+    def fail(self, request: QueuedRequest) -> None:
+        """
+        Return a request to the queue to be retried later, or mark it as dead
+        if it has reached `max_attempts`.
+        """
+        delay = self.retry_delay * 2 ** (request.attempts - 1)
+
+        with self._lock:
+            self._db.execute(
+                "UPDATE inbox SET lease_until = NULL, available_at = ?, dead = ? WHERE id = ?",
+                (time.time() + delay, int(request.attempts >= self.max_attempts), request.id)
+            )
+
+    def depth(self) -> int:
+        """
+        Returns the number of requests waiting to be handled.
+        """
+        with self._lock:
+            return self._db.execute("SELECT COUNT(*) FROM inbox WHERE dead = 0").fetchone()[0]
+
+    def process(self, handler) -> bool:
+        """
+        Claim one request and pass it to `handler`. Returns false if the
+        queue was empty.
+        """
+        request = self.claim()
+
+        if request is None:
+            return False
+
+        try:
+            handler(request)
+        except Exception as e:
+            logger.warning("Inbox request %s failed, attempt %s: %s", request.id, request.attempts, e)
+            self.fail(request)
+        else:
+            self.complete(request)
+
+        return True
+
+    def start(self, handler, workers: int = 4, poll_interval: float = 1) -> None:
+        """
+        Start `workers` threads that pass requests to `handler`. Idle workers
+        wake up when a request is enqueued by this process, and every
+        `poll_interval` seconds to pick up requests from other processes and
+        retries.
+        """
+        self._stopping.clear()
+
+        for _ in range(workers):
+            worker = threading.Thread(target=self._work, args=(handler, poll_interval), daemon=True)
+            worker.start()
+            self._workers.append(worker)
+
+    def stop(self) -> None:
+        """
+        Stop the workers after their current request, and wait for them.
+        """
+        self._stopping.set()
+        self._wakeup.set()
+
+        for worker in self._workers:
+            worker.join()
+
+        self._workers = []
+
+    def close(self) -> None:
+        """
+        Stop the workers and close the database.
+        """
+        self.stop()
+
+        with self._lock:
+            self._db.close()
+
+    def _work(self, handler, poll_interval: float) -> None:
+        while not self._stopping.is_set():
+            if not self.process(handler):
+                self._wakeup.wait(poll_interval)
+                self._wakeup.clear()
+
+def _is_signed(headers: list) -> bool:
+    headers_obj = Headers(headers)
+
+    if headers_obj.get("signature") is None:
+        return False
+
+    return headers_obj.get("digest") is not None or headers_obj.get("content-digest") is not None
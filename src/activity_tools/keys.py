@@ -0,0 +1,221 @@
+import time
+from urllib.parse import urldefrag, urlparse
+
+from .cache import TTLCache
+from .crypto import load_multibase_public_key
+from .objects import fetch_document
+from . import metrics
+
+class RemoteKey:
+    """
+    A parsed public key of a remote actor.
+    """
+
+    id: str
+    """ The keyId, for example `https://example.com/users/foo#main-key` """
+
+    owner: str
+    """ URL of the actor that owns this key """
+
+    key: object
+    """ The parsed public key object from cryptography, RSA or Ed25519 """
+
+    fetched_at: float
+    """ When the key was fetched, in `time.monotonic()` seconds """
+
+    def __init__(self, id, owner, pem=None, key=None) -> None:
+        """
+        Create a key from a `pem` string, or an already parsed `key`.
+        """
+        if key is None:
+            from cryptography.hazmat.primitives.serialization import load_pem_public_key
+
+            key = load_pem_public_key(pem.encode())
+
+        self.id = id
+        self.owner = owner
+        self.key = key
+        self.fetched_at = time.monotonic()
+
+class KeyStore:
+    """
+    Maps keyId's to parsed public keys. Missing keys are resolved by
+    fetching the key document. Hot senders are served from memory
+    without any PEM parsing or HTTP requests.
+
+    ```python
+    Example:
+        remote_key = key_store.get(signature_header.key_id)
+        verify_message(remote_key.key, signature, message)
+    ```
+    """
+
+    def __init__(self, maxsize: int = 4096, ttl: float = 3600, min_refresh_interval: float = 60) -> None:
+        """
+        Create a key store that holds at most `maxsize` keys for `ttl`
+        seconds. A key is at most refreshed once per
+        `min_refresh_interval` seconds, this protects remote servers
+        from a flood of requests with bad signatures.
+        """
+        self.cache = TTLCache(maxsize=maxsize, ttl=ttl)
+        self.min_refresh_interval = min_refresh_interval
+
+    def get(self, key_id: str, refresh: bool = False) -> RemoteKey:
+        """
+        Return the key for `key_id`. Use `refresh=True` to fetch the key
+        again, for example if the remote has rotated it. Returns `None` if
+        the refresh was rate limited, or if the key document can not be
+        trusted, see `_fetch`.
+        """
+        remote_key = self.cache.get(key_id)
+
+        if remote_key is not None:
+            if not refresh:
+                return remote_key
+            if time.monotonic() - remote_key.fetched_at < self.min_refresh_interval:
+                return None
+
+        remote_key = self._fetch(key_id, revalidate=refresh)
+        if remote_key is not None:
+            self.cache.set(key_id, remote_key)
+        return remote_key
+
+    async def get_async(self, key_id: str, refresh: bool = False) -> RemoteKey:
+        """
+        Coroutine version of `get` that does not block the event loop.
+        """
+        import asyncio
+
+        if refresh:
+            return await asyncio.to_thread(self.get, key_id, True)
+
+        return await self.cache.get_or_fetch_async(key_id, lambda: self._fetch(key_id))
+
+    def invalidate(self, key_id: str) -> None:
+        """
+        Forget the key `key_id`.
+        """
+        self.cache.invalidate(key_id)
+
+    def _fetch(self, key_id: str, revalidate: bool = False) -> RemoteKey:
+        # Returns None if the document can not be trusted, a server may only
+        # serve its own documents and keys of actors on its own origin
+        url, _ = urldefrag(key_id)
+        document = fetch_document(url, revalidate)
+
+        if _document_url(document) != url:
+            return None
+
+        return self._parse_key_document(key_id, document, revalidate)
+
+    def _parse_key_document(self, key_id: str, document: dict, revalidate: bool = False) -> RemoteKey:
+        # A standalone key document, like the one served at /users/foo/key,
+        # or a standalone Multikey document
+        if "publicKeyPem" in document or "publicKeyMultibase" in document:
+            owner = document.get("owner") or document.get("controller")
+            if not self._owner_lists_key(key_id, owner, revalidate):
+                return None
+
+            if "publicKeyPem" in document:
+                return RemoteKey(key_id, owner, document["publicKeyPem"])
+
+            key = load_multibase_public_key(document["publicKeyMultibase"])
+            return RemoteKey(key_id, owner, key=key)
+
+        # An actor document, it may have several keys, for example during a
+        # key rotation. Keep the other keys of this document, so a signature
+        # made with another key does not fetch the actor again. Keys with an
+        # id outside of this document are dropped, or the document could
+        # replace the keys of other actors.
+        url, _ = urldefrag(key_id)
+        found = None
+
+        for remote_key in self._actor_keys(document):
+            if remote_key.id == key_id:
+                found = remote_key
+            elif isinstance(remote_key.id, str) and urldefrag(remote_key.id)[0] == url:
+                self.cache.set(remote_key.id, remote_key)
+
+        if found is None:
+            raise Exception(f"Key {key_id} was not found in the key document")
+
+        return found
+
+    def _owner_lists_key(self, key_id: str, owner: str, revalidate: bool = False) -> bool:
+        # The owner named by a standalone key document is only trusted if it
+        # is on the same origin, and the owner's actor document lists the key
+        if not isinstance(owner, str) or _origin(owner) != _origin(key_id):
+            return False
+
+        actor = fetch_document(owner, revalidate)
+
+        return actor.get("id") == owner and key_id in _key_ids(actor)
+
+    def _actor_keys(self, document: dict) -> list:
+        # Keys in an actor document belong to that actor, keys that claim
+        # another owner are skipped
+        actor_id = document.get("id")
+        keys = []
+
+        # RSA keys in publicKey
+        public_keys = document.get("publicKey")
+        if isinstance(public_keys, dict):
+            public_keys = [public_keys]
+
+        for public_key in public_keys or []:
+            if isinstance(public_key, dict) and "publicKeyPem" in public_key:
+                if public_key.get("owner", actor_id) != actor_id:
+                    continue
+                keys.append(RemoteKey(public_key.get("id"), actor_id, public_key["publicKeyPem"]))
+
+        # Multikeys in assertionMethod, unsupported key types are skipped
+        assertion_methods = document.get("assertionMethod")
+        if isinstance(assertion_methods, dict):
+            assertion_methods = [assertion_methods]
+
+        for method in assertion_methods or []:
+            if not isinstance(method, dict) or "publicKeyMultibase" not in method:
+                continue
+
+            if method.get("controller", actor_id) != actor_id:
+                continue
+
+            try:
+                key = load_multibase_public_key(method["publicKeyMultibase"])
+            except Exception:
+                continue
+
+            keys.append(RemoteKey(method.get("id"), actor_id, key=key))
+
+        return keys
+
+def _origin(url: str) -> tuple:
+    parsed = urlparse(url)
+    return (parsed.scheme.lower(), parsed.netloc.lower())
+
+def _document_url(document: dict) -> str:
+    id = document.get("id")
+    return urldefrag(id)[0] if isinstance(id, str) else None
+
+def _key_ids(document: dict) -> set:
+    # The keyIds an actor lists in publicKey and assertionMethod, as
+    # embedded keys or as references
+    ids = set()
+
+    for name in ("publicKey", "assertionMethod"):
+        values = document.get(name)
+        if not isinstance(values, list):
+            values = [values]
+
+        for value in values:
+            if isinstance(value, dict):
+                value = value.get("id")
+            if isinstance(value, str):
+                ids.add(value)
+
+    return ids
+
+key_store = KeyStore()
+""" Shared key store used by `verify_signature` """
+
+metrics.registry.register_cache("keys", key_store.cache)
@@ -0,0 +1,286 @@
+"""
+Lightweight instrumentation of fetches, signature verification, signing,
+deliveries, caches and the inbox queue. Nothing is recorded until
+`enable()` is called, disabled timers are a shared no-op object.
+
+```python
+Example:
+    from activity_tools import metrics
+
+    metrics.enable()
+    metrics.add_hook(lambda kind, name, value, labels: print(name, value, labels))
+
+    # Serve the metrics to Prometheus
+    text = metrics.registry.prometheus_text()
+```
+"""
+
+import time
+import threading
+
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+""" Default histogram buckets, in seconds """
+
+enabled = False
+""" True if metrics are recorded, use `enable()` and `disable()` """
+
+_hooks = []
+
+def enable() -> None:
+    """
+    Start recording metrics.
+    """
+    global enabled
+    enabled = True
+
+def disable() -> None:
+    """
+    Stop recording metrics.
+    """
+    global enabled
+    enabled = False
+
+def add_hook(hook) -> None:
+    """
+    Call `hook(kind, name, value, labels)` for every recorded value, where
+    kind is `counter` or `histogram`. Hooks only run while metrics are enabled.
+    """
+    _hooks.append(hook)
+
+def remove_hook(hook) -> None:
+    """
+    Remove a hook added with `add_hook`.
+    """
+    _hooks.remove(hook)
+
+def _label_key(labels: dict) -> tuple:
+    return tuple(sorted(labels.items()))
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+def _format_labels(key: tuple, extra: tuple = ()) -> str:
+    pairs = key + extra
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in pairs) + "}"
+
+class Counter:
+    """
+    A monotonically increasing counter, per set of labels.
+    """
+
+    def __init__(self, name: str, help: str) -> None:
+        self.name = name
+        self.help = help
+        self.values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1, **labels) -> None:
+        key = _label_key(labels)
+
+        with self._lock:
+            self.values[key] = self.values.get(key, 0) + amount
+
+        for hook in _hooks:
+            hook("counter", self.name, amount, labels)
+
+    def prometheus_text(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+
+        with self._lock:
+            for key, value in self.values.items():
+                lines.append(f"{self.name}{_format_labels(key)} {value}")
+
+        return lines
+
+class Histogram:
+    """
+    A histogram of observed values, per set of labels.
+    """
+
+    def __init__(self, name: str, help: str, buckets: tuple = DEFAULT_BUCKETS) -> None:
+        self.name = name
+        self.help = help
+        self.buckets = tuple(sorted(buckets))
+        self.values = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels) -> None:
+        key = _label_key(labels)
+
+        with self._lock:
+            entry = self.values.get(key)
+
+            if entry is None:
+                entry = self.values[key] = [[0] * len(self.buckets), 0, 0.0]
+
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    entry[0][i] += 1
+
+            entry[1] += 1
+            entry[2] += value
+
+        for hook in _hooks:
+            hook("histogram", self.name, value, labels)
+
+    def prometheus_text(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+
+        with self._lock:
+            for key, (counts, count, total) in self.values.items():
+                for bound, bucket_count in zip(self.buckets, counts):
+                    lines.append(f"{self.name}_bucket{_format_labels(key, (('le', bound),))} {bucket_count}")
+                lines.append(f"{self.name}_bucket{_format_labels(key, (('le', '+Inf'),))} {count}")
+                lines.append(f"{self.name}_count{_format_labels(key)} {count}")
+                lines.append(f"{self.name}_sum{_format_labels(key)} {total}")
+
+        return lines
+
+class Gauge:
+    """
+    A value that is read from a callable when the metrics are exported.
+    Use `type="counter"` for values that only increase.
+    """
+
+    def __init__(self, name: str, help: str, read, type: str = "gauge") -> None:
+        self.name = name
+        self.help = help
+        self.read = read
+        self.type = type
+
+    def prometheus_text(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.type}"]
+
+        values = self.read()
+        if not isinstance(values, dict):
+            values = { (): values }
+
+        for key, value in values.items():
+            lines.append(f"{self.name}{_format_labels(key)} {value}")
+
+        return lines
+
+class Registry:
+    """
+    Holds all metrics and exports them in the Prometheus text format.
+    """
+
+    def __init__(self) -> None:
+        self.metrics = {}
+        self.caches = {}
+        self._lock = threading.Lock()
+
+    def counter(self, name: str, help: str) -> Counter:
+        """
+        Returns the counter `name`, it is created on first use.
+        """
+        return self._get_or_create(name, lambda: Counter(name, help))
+
+    def histogram(self, name: str, help: str, buckets: tuple = DEFAULT_BUCKETS) -> Histogram:
+        """
+        Returns the histogram `name`, it is created on first use.
+        """
+        return self._get_or_create(name, lambda: Histogram(name, help, buckets))
+
+    def gauge(self, name: str, help: str, read) -> None:
+        """
+        Export the value returned by `read()` as the gauge `name`. The callable
+        may also return a dict that maps label tuples to values.
+        """
+        with self._lock:
+            self.metrics[name] = Gauge(name, help, read)
+
+    def register_cache(self, name: str, cache) -> None:
+        """
+        Export the hits, misses and size of a `TTLCache` with the label
+        `cache="name"`.
+        """
+        with self._lock:
+            self.caches[name] = cache
+
+    def prometheus_text(self) -> str:
+        """
+        Returns all metrics in the Prometheus text exposition format.
+        """
+        with self._lock:
+            metrics = list(self.metrics.values())
+            caches = list(self.caches.items())
+
+        if caches:
+            for name, help, attribute in (
+                    ("activity_tools_cache_hits_total", "Cache lookups that found an entry", "hits"),
+                    ("activity_tools_cache_misses_total", "Cache lookups that did not find an entry", "misses")):
+                metrics.append(Gauge(name, help, lambda attribute=attribute: {
+                    (("cache", cache_name),): getattr(cache, attribute) for cache_name, cache in caches
+                }, "counter"))
+
+            metrics.append(Gauge("activity_tools_cache_entries", "Entries in the cache", lambda: {
+                (("cache", cache_name),): len(cache) for cache_name, cache in caches
+            }))
+
+        lines = []
+        for metric in metrics:
+            lines.extend(metric.prometheus_text())
+
+        return "\n".join(lines) + "\n"
+
+    def _get_or_create(self, name, create):
+        with self._lock:
+            metric = self.metrics.get(name)
+
+            if metric is None:
+                metric = self.metrics[name] = create()
+
+            return metric
+
+registry = Registry()
+""" The shared registry used by activity-tools """
+
+class _Timer:
+
+    def __init__(self, histogram: Histogram, labels: dict) -> None:
+        self.histogram = histogram
+        self.labels = labels
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.histogram.observe(time.perf_counter() - self.start, **self.labels)
+
+class _NoopTimer:
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        pass
+
+_NOOP_TIMER = _NoopTimer()
+
+def timer(name: str, help: str = "", **labels):
+    """
+    Returns a context manager that observes the time spent inside it in the
+    histogram `name`. A shared no-op object is returned while disabled.
+    """
+    if not enabled:
+        return _NOOP_TIMER
+
+    return _Timer(registry.histogram(name, help), labels)
+
+def count(name: str, help: str = "", amount: float = 1, **labels) -> None:
+    """
+    Increase the counter `name`, if metrics are enabled.
+    """
+    if enabled:
+        registry.counter(name, help).inc(amount, **labels)
+
+def observe(name: str, value: float, help: str = "", **labels) -> None:
+    """
+    Observe `value` in the histogram `name`, if metrics are enabled.
+    """
+    if enabled:
+        registry.histogram(name, help).observe(value, **labels)
@@ -1,7 +1,14 @@
 import re
 
+_ACCT_PATTERN = re.compile(r"^acct:(.+)@(.+)$")
+
+# The builders are created for every rendered document, they use __slots__
+# to stay small and fast to create.
+
 class ImageAsset:
 
+    __slots__ = ("media_type", "url")
+
     def __init__(self, url, media_type=None) -> None:
         if not media_type:
             ext = url.split(".")[-1]
@@ -25,6 +32,8 @@ class ImageAsset:
 
 class Attachment:
 
+    __slots__ = ("attachments",)
+
     def __init__(self) -> None:
         self.attachments = []
 
@@ -40,6 +49,8 @@ class Attachment:
 
 class Link:
 
+    __slots__ = ("url", "text")
+
     def __init__(self, url, text) -> None:
         self.url = url
         self.text = text
@@ -50,6 +61,8 @@ class Link:
 
 class Tags:
 
+    __slots__ = ("domain", "tags")
+
     def __init__(self, domain) -> None:
         self.domain = domain
         self.tags = []
@@ -67,6 +80,8 @@ class Tags:
 
 class PublicKey:
 
+    __slots__ = ("id", "owner", "public_key")
+
     def __init__(self, domain, username, public_key) -> None:
         self.id = f"https://{domain}/users/{username}/key"
         self.owner = f"https://{domain}/users/{username}"
@@ -79,13 +94,37 @@ class PublicKey:
             "publicKeyPem": self.public_key,
         }
 
+class Multikey:
+    """
+    A public key in the Multikey format, as used in the `assertionMethod`
+    of an actor. `public_key` is the `publicKeyMultibase` value, see
+    `multibase_public_key`.
+    """
+
+    __slots__ = ("id", "controller", "public_key")
+
+    def __init__(self, domain, username, public_key, fragment="ed25519-key") -> None:
+        self.controller = f"https://{domain}/users/{username}"
+        self.id = f"{self.controller}#{fragment}"
+        self.public_key = public_key
+
+    def run(self) -> dict:
+        return {
+            "id": self.id,
+            "type": "Multikey",
+            "controller": self.controller,
+            "publicKeyMultibase": self.public_key,
+        }
+
 class WebFinger:
 
+    __slots__ = ("domain", "resource", "username", "actor_url")
+
     def __init__(self, domain, resource, actor_url=None) -> None:
         self.domain = domain
         self.resource = resource
 
-        m = re.match(r"^acct:(.+)@(.+)$", resource)
+        m = _ACCT_PATTERN.match(resource)
         self.username  = m.group(1)
 
         if actor_url:
@@ -1,11 +1,116 @@
-import requests
 import re
 import uuid
 from urllib.parse import urlparse
 
-from cryptography.hazmat.primitives.serialization import load_pem_public_key
+from .misc import ImageAsset, PublicKey, Multikey, Tags, Attachment
+from .cache import TTLCache
+from .breaker import FetchError
+from .transport import get_transport, TransportError
+from . import breaker, metrics
 
-from .misc import ImageAsset, PublicKey, Tags, Attachment
+document_store = None
+""" Optional `DocumentStore` that keeps fetched documents on disk, see `set_document_store` """
+
+def set_document_store(store) -> None:
+    """
+    Keep fetched actor and key documents in `store`, a `DocumentStore`, so
+    they survive restarts and are shared between worker processes. Pass
+    `None` to disable.
+    """
+    global document_store
+    document_store = store
+
+def fetch_document(url: str, revalidate: bool = False) -> dict:
+    """
+    Fetch a remote ActivityPub JSON document. With a `document_store`,
+    recently fetched documents are served from disk and older ones are
+    revalidated with a conditional GET. Use `revalidate=True` to always ask
+    the remote. Raises `FetchError` on failure.
+    """
+    store = document_store
+    stored = store.get(url) if store is not None else None
+
+    if stored is not None and not revalidate and stored.age < store.max_age:
+        return stored.document
+
+    headers = {
+        'Content-Type': "application/activity+json",
+        'Accept': 'application/activity+json'
+    }
+
+    if stored is not None:
+        headers.update(stored.conditional_headers())
+
+    # Fail fast for documents that are gone and hosts that are down
+    breaker.check(url)
+
+    host = urlparse(url).netloc
+
+    try:
+        with metrics.timer("activity_tools_fetch_seconds", "Time to fetch remote documents", host=host):
+            resp = get_transport().get(url, headers=headers)
+    except TransportError as e:
+        breaker.record(url, error=e)
+        metrics.count("activity_tools_fetch_total", "Fetches of remote documents", host=host, status="error")
+        raise FetchError(url, None, str(e))
+
+    breaker.record(url, resp.status)
+    metrics.count("activity_tools_fetch_total", "Fetches of remote documents", host=host, status=resp.status)
+
+    if resp.status == 304 and stored is not None:
+        store.touch(url)
+        return stored.document
+
+    if resp.status > 299:
+        if store is not None and resp.status in (404, 410):
+            store.delete(url)
+        raise FetchError(url, resp.status, f"{url} responded with a {resp.status}")
+
+    try:
+        document = resp.json()
+    except ValueError:
+        raise FetchError(url, resp.status, f"{url} is not JSON")
+
+    if store is not None:
+        store.put(url, document, resp.headers.get("etag"), resp.headers.get("last-modified"))
+
+    return document
+
+actor_cache = TTLCache(maxsize=4096, ttl=300)
+"""
+Shared cache of fetched remote actors, keyed by actor URL. Use
+`actor_cache.invalidate(url)` to drop a stale actor, for example after
+an `Update` or `Delete` activity.
+"""
+
+metrics.registry.register_cache("actors", actor_cache)
+
+_SNAKE_PATTERN = re.compile(r'(?<!^)(?=[A-Z])')
+
+_ACTOR_FIELDS = tuple(
+    (key, _SNAKE_PATTERN.sub('_', key).lower())
+    for key in (
+        "publicKey",
+        "id",
+        "type",
+        "inbox",
+        "outbox",
+        "following",
+        "followers",
+        "discoverable",
+        "summary",
+        "published",
+        "name",
+        "preferredUsername",
+        "icon",
+        "image",
+        "manuallyApprovesFollowers",
+        "attachment",
+        "tag",
+        "assertionMethod"
+    )
+)
+""" Fields read from a fetched actor, as (JSON key, attribute name) pairs """
 
 class Actor:
     """
@@ -20,7 +125,7 @@ class Actor:
         """
         This creates an empty actor object
         """
-        self.snake_pattern = re.compile(r'(?<!^)(?=[A-Z])')
+        self._parsed_public_key = None
 
     def add_property_value(self, name, value) -> None:
         """
@@ -36,6 +141,18 @@ class Actor:
         """
         self.tag.add_emoji(name, url)
 
+    def add_multikey(self, public_key_bytes: bytes, fragment: str = "ed25519-key") -> None:
+        """
+        Publish an Ed25519 public key, in PEM format, as a Multikey in
+        `assertionMethod`. The key ID is the actor URL with `fragment`. An
+        actor can publish several keys, for example during a key rotation.
+        """
+        from cryptography.hazmat.primitives.serialization import load_pem_public_key
+        from .crypto import multibase_public_key
+
+        public_key = multibase_public_key(load_pem_public_key(public_key_bytes))
+        self.assertion_method.append(Multikey(self.domain, self.username, public_key, fragment).run())
+
     def create(self, domain: str, username: str, public_key_bytes: bytes) -> None:
         """
         Populate the actor object with data. This is a useful to create the
@@ -67,61 +184,72 @@ class Actor:
         self.manually_approves_followers = None
         self.attachment = Attachment()
         self.tag = Tags(self.domain)
+        self.assertion_method = []
 
     @classmethod
-    def fetch(cls, actor_url):
+    def fetch(cls, actor_url, cache=True):
+        """
+        Fetch a remote actor. Actors are served from `actor_cache` when
+        possible, pass `cache=False` to force a new request.
+        """
+        if cache:
+            actor = actor_cache.get(actor_url)
+            if actor is not None:
+                return actor
+
         actor = Actor()
-        actor._fetch(actor_url)
+        actor._fetch(actor_url, revalidate=not cache)
+        actor_cache.set(actor_url, actor)
         return actor
 
-    def _fetch(self, actor_url):
+    @classmethod
+    async def fetch_async(cls, actor_url, cache=True):
+        """
+        Coroutine version of `fetch` that does not block the event loop.
+        It shares `actor_cache` with `fetch`, and concurrent fetches of the
+        same actor are made only once.
+        """
+        import asyncio
+
+        if not cache:
+            return await asyncio.to_thread(cls.fetch, actor_url, False)
+
+        def fetch():
+            actor = Actor()
+            actor._fetch(actor_url)
+            return actor
+
+        return await actor_cache.get_or_fetch_async(actor_url, fetch)
+
+    def _fetch(self, actor_url, revalidate=False):
         self.actor_raw = {}
 
         if not actor_url:
             raise Exception("Actor URL is not set")
 
-        headers = {
-            'Content-Type': "application/activity+json",
-            'Accept': 'application/activity+json'
-        }
-
-        actor_resp = requests.get(actor_url, headers=headers)
-        if actor_resp.status_code > 299:
-            raise Exception(f"Actor {actor_url} responded with a {actor_resp.status_code}")
-
-        self.actor_raw = actor_resp.json()
+        self.actor_raw = fetch_document(actor_url, revalidate)
         urlid = urlparse(self.actor_raw['id'])
 
         self.domain = urlid.netloc
 
-        keys = [
-            "publicKey",
-            "id",
-            "type",
-            "inbox",
-            "outbox",
-            "following",
-            "followers",
-            "discoverable",
-            "summary",
-            "published",
-            "name",
-            "preferredUsername",
-            "icon",
-            "image",
-            "manuallyApprovesFollowers",
-            "attachment",
-            "tag"
-        ]
-
-        for key in keys:
-            key_snake = self.snake_pattern.sub('_', key).lower()
-            setattr(self, key_snake, self.actor_raw.get(key))
+        for key, attribute in _ACTOR_FIELDS:
+            setattr(self, attribute, self.actor_raw.get(key))
     
-        self.public_key_pem = self.public_key['publicKeyPem']
+        # Actors with only Multikeys in assertionMethod have no publicKey
+        self.public_key_pem = (self.public_key or {}).get('publicKeyPem')
+        self._parsed_public_key = None
 
     def get_public_key(self):
-        return load_pem_public_key(self.public_key_pem.encode())
+        """
+        Return the parsed public key. The key is parsed once and then
+        kept with the actor. Returns `None` if the actor has no
+        `publicKeyPem`, the keys in `assertion_method` are not parsed.
+        """
+        if self._parsed_public_key is None and self.public_key_pem is not None:
+            from cryptography.hazmat.primitives.serialization import load_pem_public_key
+
+            self._parsed_public_key = load_pem_public_key(self.public_key_pem.encode())
+        return self._parsed_public_key
 
     def run(self) -> dict:
         required_document = {
@@ -149,10 +277,10 @@ class Actor:
         extra_values = {}
 
         if self.icon_url:
-            extra_values["icon"] = ImageAsset(self.icon_url)
+            extra_values["icon"] = ImageAsset(self.icon_url).run()
 
-        if self.icon_url:
-            extra_values["image"] = ImageAsset(self.image_url)
+        if self.image_url:
+            extra_values["image"] = ImageAsset(self.image_url).run()
 
         if self.manually_approves_followers:
             extra_values["manuallyApprovesFollowers"] = self.manually_approves_followers
@@ -166,6 +294,10 @@ class Actor:
         if self.outbox:
             extra_values["outbox"] = self.outbox
 
+        if self.assertion_method:
+            required_document["@context"].append("https://w3id.org/security/multikey/v1")
+            extra_values["assertionMethod"] = self.assertion_method
+
         return { **required_document, **extra_values }
 
 
@@ -182,6 +314,13 @@ class WrapActivityStreamsObject:
         return { **context, **self.object.run() }
 
 class InboxObject:
+    """
+    An activity received in an inbox. Fields are read from the raw data
+    when they are accessed, and nothing is fetched from the network until
+    the `actor` or `object` properties, or their coroutine versions, are used.
+    """
+
+    __slots__ = ("raw",)
 
     raw: dict
     """
@@ -190,18 +329,52 @@ class InboxObject:
 
     def __init__(self, data) -> None:
         self.raw = data
-        self.id = data['id']
-        self.type = data['type'].lower()
-        self._actor = data['actor']
-        self._object = data['object']
+
+    @property
+    def id(self) -> str:
+        """ The activity ID """
+        return self.raw.get('id')
+
+    @property
+    def type(self) -> str:
+        """ The activity type in lower case, for example `follow` """
+        return self.raw['type'].lower()
+
+    @property
+    def actor_id(self) -> str:
+        """ URL of the actor that sent the activity """
+        return _object_id(self.raw.get('actor'))
+
+    @property
+    def object_id(self) -> str:
+        """ URL of the object of the activity, also if it is embedded """
+        return _object_id(self.raw.get('object'))
+
+    @property
+    def object_type(self) -> str:
+        """ Type of the embedded object, or `None` if the object is a URL """
+        object = self.raw.get('object')
+        return object.get('type') if isinstance(object, dict) else None
 
     @property
     def actor(self) -> Actor:
-        return Actor.fetch(actor_url=self._actor)
+        return Actor.fetch(actor_url=self.actor_id)
 
     @property
     def object(self) -> Actor:
-        return Actor.fetch(actor_url=self._object)
+        return Actor.fetch(actor_url=self.object_id)
+
+    async def fetch_actor(self) -> Actor:
+        """
+        Coroutine version of the `actor` property
+        """
+        return await Actor.fetch_async(actor_url=self.actor_id)
+
+    async def fetch_object(self) -> Actor:
+        """
+        Coroutine version of the `object` property
+        """
+        return await Actor.fetch_async(actor_url=self.object_id)
 
     def run(self) -> dict:
         """
@@ -209,16 +382,85 @@ class InboxObject:
         """
         return self.raw
 
+def _object_id(value) -> str:
+    if isinstance(value, dict):
+        return value.get('id')
+    return value
+
 class Follow(InboxObject):
 
+    __slots__ = ()
+
     def __init__(self, data) -> None:
         super().__init__(data)
 
 class Undo(InboxObject):
 
+    __slots__ = ()
+
     def __init__(self, data) -> None:
         super().__init__(data)
 
+class Create(InboxObject):
+    """
+    A Create activity, the created object is usually embedded, see `object_type`.
+    """
+
+    __slots__ = ()
+
+class Update(InboxObject):
+    """
+    An Update activity, for example of a post or of the sending actor.
+    """
+
+    __slots__ = ()
+
+    @property
+    def is_actor_update(self) -> bool:
+        """ True if the sender updated its own actor """
+        return self.object_id == self.actor_id
+
+class Delete(InboxObject):
+    """
+    A Delete activity, for example of a post or of the sending actor.
+    """
+
+    __slots__ = ()
+
+    @property
+    def is_actor_delete(self) -> bool:
+        """ True if the sender deleted its own actor """
+        return self.object_id == self.actor_id
+
+class Announce(InboxObject):
+    """
+    An Announce activity (a boost), the object is usually a URL.
+    """
+
+    __slots__ = ()
+
+class Like(InboxObject):
+    """
+    A Like activity, the object is usually a URL.
+    """
+
+    __slots__ = ()
+
+class AcceptActivity(InboxObject):
+    """
+    An incoming Accept activity, for example of a Follow we sent. It is
+    not named Accept since `Accept` builds outgoing Accept responses.
+    """
+
+    __slots__ = ()
+
+class Reject(InboxObject):
+    """
+    A Reject activity, for example of a Follow we sent.
+    """
+
+    __slots__ = ()
+
 class ActivityPubObject:
     
     id: str
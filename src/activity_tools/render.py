@@ -0,0 +1,112 @@
+import hashlib
+
+from .cache import TTLCache
+from . import codec
+
+class RenderedDocument:
+    """
+    A document serialized to JSON, with a strong ETag.
+    """
+
+    body: bytes
+    """ The JSON document """
+
+    etag: str
+    """ A strong ETag, including the quotes """
+
+    version: object
+    """ The version the document was rendered from """
+
+    def __init__(self, body: bytes, version=None) -> None:
+        self.body = body
+        self.etag = f'"{hashlib.sha256(body).hexdigest()[:32]}"'
+        self.version = version
+
+    def matches(self, if_none_match: str) -> bool:
+        """
+        Returns true if the value of an If-None-Match header matches this
+        document, the client then already has it.
+        """
+        if not if_none_match:
+            return False
+
+        for etag in if_none_match.split(","):
+            etag = etag.strip()
+
+            if etag == "*":
+                return True
+
+            if etag.startswith("W/"):
+                etag = etag[2:]
+
+            if etag == self.etag:
+                return True
+
+        return False
+
+class RenderCache:
+    """
+    Cache of local documents, like actors, keys and WebFinger responses,
+    stored as final JSON bytes. The document is only built and serialized
+    when it is missing, when it is invalidated or when its version changes.
+
+    ```python
+    Example:
+        render_cache = RenderCache()
+
+        status, body, headers = render_cache.respond(
+            f"actor:{username}",
+            lambda: make_actor(username).run(),
+            request.headers.get("if-none-match")
+        )
+        return Response(body, status, { **ContentTypes.activity, **headers })
+    ```
+    """
+
+    def __init__(self, maxsize: int = 1024, ttl: float = 3600) -> None:
+        """
+        Create a cache that holds at most `maxsize` documents. Documents are
+        rendered again after `ttl` seconds.
+        """
+        self.cache = TTLCache(maxsize=maxsize, ttl=ttl)
+
+    def get(self, key, render, version=None) -> RenderedDocument:
+        """
+        Return the document for `key`. The callable `render` returns the
+        document as a dict, it is called on a miss or if the cached document
+        was rendered from another `version`.
+        """
+        document = self.cache.get(key)
+
+        if document is None or document.version != version:
+            body = codec.dumps(render())
+            document = RenderedDocument(body, version)
+            self.cache.set(key, document)
+
+        return document
+
+    def respond(self, key, render, if_none_match: str = None, version=None) -> tuple:
+        """
+        Like `get`, but returns a (status, body, headers) tuple that is ready
+        to be sent. The status is 304 with an empty body if `if_none_match`
+        matches the document.
+        """
+        document = self.get(key, render, version)
+        headers = { "ETag": document.etag }
+
+        if document.matches(if_none_match):
+            return 304, b"", headers
+
+        return 200, document.body, headers
+
+    def invalidate(self, key) -> None:
+        """
+        Drop the document `key`, call this when the underlying data changes.
+        """
+        self.cache.invalidate(key)
+
+    def clear(self) -> None:
+        """
+        Drop all documents.
+        """
+        self.cache.clear()
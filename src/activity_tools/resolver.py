@@ -0,0 +1,212 @@
+import re
+from urllib.parse import urlparse, quote
+
+from .cache import TTLCache
+from .breaker import FetchError
+from .transport import get_transport, TransportError
+from .objects import Actor
+from . import breaker, metrics
+
+_HANDLE_PATTERN = re.compile(r"^(?:acct:|@)?([^@\s/]+)@([^@\s/]+)$")
+
+_ACTIVITY_TYPES = (
+    "application/activity+json",
+    'application/ld+json; profile="https://www.w3.org/ns/activitystreams"',
+)
+
+def parse_handle(handle: str) -> str:
+    """
+    Normalize a handle like `@foo@example.com`, `foo@example.com` or
+    `acct:foo@example.com` to `acct:foo@example.com`, with the host in lower
+    case. Raises an exception if it is not a handle.
+    """
+    m = _HANDLE_PATTERN.match(handle.strip())
+
+    if m is None:
+        raise Exception(f"{handle} is not a handle")
+
+    return f"acct:{m.group(1)}@{m.group(2).lower()}"
+
+class WebFingerResolver:
+    """
+    Resolves handles like `@foo@example.com` to actor URLs with WebFinger.
+    Batches of handles are resolved concurrently, limited both in total and
+    per host. Results are cached for `ttl` seconds, and handles that could
+    not be resolved for `negative_ttl` seconds.
+
+    ```python
+    Example:
+        resolver = WebFingerResolver()
+
+        actor_url = resolver.resolve("@foo@example.com")
+
+        # Resolve a follow list import and fetch the actors
+        actors = await resolver.fetch_actors(handles)
+        found = [actor for actor in actors.values() if actor is not None]
+    ```
+    """
+
+    def __init__(
+            self,
+            concurrency: int = 32,
+            per_host: int = 4,
+            ttl: float = 86400,
+            negative_ttl: float = 600,
+            maxsize: int = 10000,
+            scheme: str = "https"
+        ) -> None:
+
+        """
+        Create a resolver with at most `concurrency` requests in flight, and
+        at most `per_host` to a single host. The `scheme` is only changed
+        to test against a local server.
+        """
+        self.concurrency = concurrency
+        self.per_host = per_host
+        self.negative_ttl = negative_ttl
+        self.scheme = scheme
+
+        self.cache = TTLCache(maxsize=maxsize, ttl=ttl)
+        """ Resolved actor URLs, keyed by `acct:` resource """
+
+        self.negative = TTLCache(maxsize=maxsize, ttl=negative_ttl)
+        """ Resources that could not be resolved, with the reason """
+
+    def resolve(self, handle: str) -> str:
+        """
+        Returns the actor URL for `handle`, or `None` if it could not be
+        resolved.
+        """
+        resource = parse_handle(handle)
+
+        actor_url = self.cache.get(resource)
+        if actor_url is not None:
+            return actor_url
+
+        if resource in self.negative:
+            return None
+
+        try:
+            actor_url = self._fetch(resource)
+        except Exception as e:
+            self.negative.set(resource, str(e))
+            return None
+
+        self.cache.set(resource, actor_url)
+        return actor_url
+
+    async def resolve_many(self, handles: list) -> dict:
+        """
+        Resolve `handles` concurrently. Returns a dict that maps each handle
+        to its actor URL, or to `None` if it could not be resolved. Handles
+        that are not handles at all also map to `None`.
+        """
+        import asyncio
+
+        global_limit = asyncio.Semaphore(self.concurrency)
+        host_limits = {}
+
+        async def resolve(handle):
+            try:
+                resource = parse_handle(handle)
+            except Exception:
+                return None
+
+            if resource in self.negative:
+                return None
+
+            host = resource.split("@")[-1]
+            host_limit = host_limits.setdefault(host, asyncio.Semaphore(self.per_host))
+
+            # Wait for the host first, so handles queued for one busy host
+            # do not hold global slots and starve all other hosts
+            async with host_limit, global_limit:
+                try:
+                    return await self.cache.get_or_fetch_async(resource, lambda: self._fetch(resource))
+                except Exception as e:
+                    self.negative.set(resource, str(e))
+                    return None
+
+        handles = list(dict.fromkeys(handles))
+        actor_urls = await asyncio.gather(*[resolve(handle) for handle in handles])
+
+        return dict(zip(handles, actor_urls))
+
+    def resolve_many_sync(self, handles: list) -> dict:
+        """
+        Blocking version of `resolve_many`, for code that is not async.
+        """
+        import asyncio
+
+        return asyncio.run(self.resolve_many(handles))
+
+    async def fetch_actors(self, handles: list) -> dict:
+        """
+        Resolve `handles` and fetch the actors, see `Actor.fetch_async`.
+        Returns a dict that maps each handle to its `Actor`, or to `None`
+        if it could not be resolved or fetched.
+        """
+        import asyncio
+
+        actor_urls = await self.resolve_many(handles)
+
+        global_limit = asyncio.Semaphore(self.concurrency)
+        host_limits = {}
+
+        async def fetch(actor_url):
+            if actor_url is None:
+                return None
+
+            host = urlparse(actor_url).netloc
+            host_limit = host_limits.setdefault(host, asyncio.Semaphore(self.per_host))
+
+            async with host_limit, global_limit:
+                try:
+                    return await Actor.fetch_async(actor_url)
+                except Exception:
+                    return None
+
+        actors = await asyncio.gather(*[fetch(actor_url) for actor_url in actor_urls.values()])
+
+        return dict(zip(actor_urls.keys(), actors))
+
+    def invalidate(self, handle: str) -> None:
+        """
+        Forget the result for `handle`, found or not.
+        """
+        resource = parse_handle(handle)
+        self.cache.invalidate(resource)
+        self.negative.invalidate(resource)
+
+    def _fetch(self, resource: str) -> str:
+        host = resource.split("@")[-1]
+        url = f"{self.scheme}://{host}/.well-known/webfinger?resource={quote(resource, safe=':@')}"
+
+        # Fail fast for hosts that are down
+        breaker.check(url)
+
+        try:
+            with metrics.timer("activity_tools_webfinger_seconds", "Time to resolve a handle", host=host):
+                resp = get_transport().get(url, headers={ "Accept": "application/jrd+json, application/json" })
+        except TransportError as e:
+            breaker.record(url, error=e)
+            raise FetchError(url, None, str(e))
+
+        breaker.record(url, resp.status)
+
+        if resp.status > 299:
+            raise FetchError(url, resp.status, f"{resource} responded with a {resp.status}")
+
+        return _actor_url(resp.json(), resource)
+
+def _actor_url(document: dict, resource: str) -> str:
+    for link in document.get("links") or []:
+        if link.get("rel") == "self" and link.get("type") in _ACTIVITY_TYPES and link.get("href"):
+            return link["href"]
+
+    raise Exception(f"{resource} has no ActivityPub actor")
+
+resolver = WebFingerResolver()
+""" Shared resolver """
+
+metrics.registry.register_cache("webfinger", resolver.cache)
@@ -0,0 +1,126 @@
+import time
+import sqlite3
+import threading
+
+from . import codec
+
+class StoredDocument:
+    """
+    A remote JSON document with the validators needed to revalidate it.
+    """
+
+    url: str
+    document: dict
+    etag: str
+    last_modified: str
+
+    fetched_at: float
+    """ When the document was last fetched or revalidated, in unix time """
+
+    def __init__(self, url, document, etag, last_modified, fetched_at) -> None:
+        self.url = url
+        self.document = document
+        self.etag = etag
+        self.last_modified = last_modified
+        self.fetched_at = fetched_at
+
+    @property
+    def age(self) -> float:
+        """ Seconds since the document was fetched or revalidated """
+        return time.time() - self.fetched_at
+
+    def conditional_headers(self) -> dict:
+        """
+        Returns If-None-Match and If-Modified-Since headers for a conditional GET.
+        """
+        headers = {}
+
+        if self.etag:
+            headers["If-None-Match"] = self.etag
+
+        if self.last_modified:
+            headers["If-Modified-Since"] = self.last_modified
+
+        return headers
+
+class DocumentStore:
+    """
+    A disk backed store of remote documents, like actors and keys, in
+    SQLite. The store survives restarts and can be shared by several
+    worker processes. Documents younger than `max_age` seconds are used
+    as is, older documents are revalidated with a conditional GET.
+
+    ```python
+    Example:
+        set_document_store(DocumentStore("/var/lib/myapp/documents.db"))
+    ```
+    """
+
+    def __init__(self, path: str, max_age: float = 3600) -> None:
+        """
+        Open, or create, the store at `path`.
+        """
+        self.path = path
+        self.max_age = max_age
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None, timeout=30)
+
+        with self._lock:
+            if path != ":memory:":
+                self._db.execute("PRAGMA journal_mode=WAL")
+
+            self._db.execute("""
+                CREATE TABLE IF NOT EXISTS documents (
+                    url TEXT PRIMARY KEY,
+                    document TEXT NOT NULL,
+                    etag TEXT,
+                    last_modified TEXT,
+                    fetched_at REAL NOT NULL
+                )
+            """)
+
+    def get(self, url: str) -> StoredDocument:
+        """
+        Returns the stored document for `url`, or `None`.
+        """
+        with self._lock:
+            row = self._db.execute(
+                "SELECT document, etag, last_modified, fetched_at FROM documents WHERE url = ?",
+                (url,)
+            ).fetchone()
+
+        if row is None:
+            return None
+
+        return StoredDocument(url, codec.loads(row[0], max_size=None), row[1], row[2], row[3])
+
+    def put(self, url: str, document: dict, etag: str = None, last_modified: str = None) -> None:
+        """
+        Store a freshly fetched document.
+        """
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO documents (url, document, etag, last_modified, fetched_at) VALUES (?, ?, ?, ?, ?)",
+                (url, codec.dumps(document).decode("utf-8"), etag, last_modified, time.time())
+            )
+
+    def touch(self, url: str) -> None:
+        """
+        Mark the document for `url` as revalidated.
+        """
+        with self._lock:
+            self._db.execute("UPDATE documents SET fetched_at = ? WHERE url = ?", (time.time(), url))
+
+    def delete(self, url: str) -> None:
+        """
+        Remove the document for `url`.
+        """
+        with self._lock:
+            self._db.execute("DELETE FROM documents WHERE url = ?", (url,))
+
+    def close(self) -> None:
+        """
+        Close the database.
+        """
+        with self._lock:
+            self._db.close()
@@ -0,0 +1,262 @@
+import threading
+from urllib.parse import urljoin, urlparse
+
+from . import codec
+
+MAX_RESPONSE_SIZE = 1024 * 1024
+""" Default limit, in bytes, for response bodies """
+
+DEFAULT_TIMEOUT = (5, 10)
+""" Default connect and read timeouts, in seconds """
+
+_REDIRECTS = (301, 302, 303, 307, 308)
+
+class TransportError(Exception):
+    """
+    Raised when a request could not be completed, for example on a
+    timeout, a refused connection, a response that is too large or too
+    many redirects.
+    """
+
+    url: str
+    """ The URL that failed """
+
+    def __init__(self, url: str, message: str) -> None:
+        self.url = url
+        super().__init__(message)
+
+class Response:
+    """
+    A response read by a `Transport`.
+    """
+
+    __slots__ = ("url", "status", "headers", "body")
+
+    url: str
+    """ The final URL, after redirects """
+
+    status: int
+    """ The HTTP status code """
+
+    headers: dict
+    """ The response headers, with lower case names """
+
+    body: bytes
+    """ The response body """
+
+    def __init__(self, url: str, status: int, headers, body: bytes) -> None:
+        self.url = url
+        self.status = status
+        self.headers = { name.lower(): value for name, value in dict(headers).items() }
+        self.body = body
+
+    def json(self):
+        """
+        Parse the body as JSON.
+        """
+        return codec.loads(self.body, max_size=None)
+
+class Transport:
+    """
+    Sends all outbound HTTP requests of the library, see `get_transport`.
+    Subclass this and implement `request` to send requests another way.
+    """
+
+    def request(self, method: str, url: str, headers: dict = None, body: bytes = None, timeout=None) -> Response:
+        """
+        Send a request and return the `Response`. The `timeout` is a
+        (connect, read) tuple in seconds. Raises `TransportError` if no
+        response could be read.
+        """
+        raise NotImplementedError
+
+    def get(self, url: str, headers: dict = None, timeout=None) -> Response:
+        return self.request("GET", url, headers, None, timeout)
+
+    def post(self, url: str, body: bytes, headers: dict = None, timeout=None) -> Response:
+        return self.request("POST", url, headers, body, timeout)
+
+    def close(self) -> None:
+        """
+        Release pooled connections.
+        """
+        pass
+
+class RequestsTransport(Transport):
+    """
+    Sends requests with a pooled `requests.Session`, so connections to a
+    host are kept alive and reused. Response bodies are streamed and the
+    request is aborted as soon as a body is larger than `max_size`. GET
+    requests follow at most `max_redirects` redirects, and never from
+    https to http.
+
+    ```python
+    Example:
+        set_transport(RequestsTransport(timeout=(3, 10), max_size=512 * 1024))
+    ```
+    """
+
+    def __init__(
+            self,
+            timeout = DEFAULT_TIMEOUT,
+            max_size: int = MAX_RESPONSE_SIZE,
+            max_redirects: int = 3,
+            pool_connections: int = 100,
+            pool_maxsize: int = 16
+        ) -> None:
+
+        """
+        Create a transport with a default `timeout` as a (connect, read)
+        tuple. Connections are kept for up to `pool_connections` hosts, with
+        at most `pool_maxsize` connections to each.
+        """
+        self.timeout = timeout
+        self.max_size = max_size
+        self.max_redirects = max_redirects
+        self.pool_connections = pool_connections
+        self.pool_maxsize = pool_maxsize
+
+        self._session = None
+        self._lock = threading.Lock()
+
+    def request(self, method: str, url: str, headers: dict = None, body: bytes = None, timeout=None) -> Response:
+        import requests
+
+        session = self._get_session()
+
+        for _ in range(self.max_redirects + 1):
+            try:
+                resp = session.request(
+                    method,
+                    url,
+                    headers=headers,
+                    data=body,
+                    timeout=timeout or self.timeout,
+                    stream=True,
+                    allow_redirects=False
+                )
+            except requests.RequestException as e:
+                raise TransportError(url, f"{url} could not be fetched: {e}")
+
+            with resp:
+                location = resp.headers.get("location")
+
+                if method == "GET" and resp.status_code in _REDIRECTS and location:
+                    url = self._redirect(url, location)
+                    continue
+
+                return Response(url, resp.status_code, resp.headers, self._read(url, resp))
+
+        raise TransportError(url, f"{url} redirected more than {self.max_redirects} times")
+
+    def close(self) -> None:
+        with self._lock:
+            if self._session is not None:
+                self._session.close()
+                self._session = None
+
+    def _get_session(self):
+        with self._lock:
+            if self._session is None:
+                import requests
+                from requests.adapters import HTTPAdapter
+
+                session = requests.Session()
+                adapter = HTTPAdapter(pool_connections=self.pool_connections, pool_maxsize=self.pool_maxsize)
+                session.mount("http://", adapter)
+                session.mount("https://", adapter)
+                self._session = session
+
+            return self._session
+
+    def _redirect(self, url: str, location: str) -> str:
+        target = urljoin(url, location)
+
+        if urlparse(url).scheme == "https" and urlparse(target).scheme != "https":
+            raise TransportError(url, f"{url} redirected to {target}, refusing to leave https")
+
+        return target
+
+    def _read(self, url: str, resp) -> bytes:
+        import requests
+
+        length = resp.headers.get("content-length")
+        if length is not None and length.isdigit() and int(length) > self.max_size:
+            raise TransportError(url, f"{url} is larger than {self.max_size} bytes")
+
+        chunks = []
+        size = 0
+
+        try:
+            for chunk in resp.iter_content(64 * 1024):
+                size += len(chunk)
+                if size > self.max_size:
+                    raise TransportError(url, f"{url} is larger than {self.max_size} bytes")
+                chunks.append(chunk)
+        except requests.RequestException as e:
+            raise TransportError(url, f"{url} could not be read: {e}")
+
+        return b"".join(chunks)
+
+class LocalTransport(Transport):
+    """
+    An in-process transport for tests and benchmarks, no sockets are used.
+    Requests are passed to `handler(method, url, headers, body)`, which
+    returns a (status, headers, body) tuple. A dict or list body is sent
+    as JSON.
+
+    ```python
+    Example:
+        def handler(method, url, headers, body):
+            if url == "https://example.com/users/foo":
+                return 200, {}, { "id": url, "type": "Person", ... }
+            return 404, {}, b""
+
+        set_transport(LocalTransport(handler))
+    ```
+    """
+
+    def __init__(self, handler, max_size: int = MAX_RESPONSE_SIZE) -> None:
+        self.handler = handler
+        self.max_size = max_size
+
+        self.requests = 0
+        """ Number of requests handled """
+
+    def request(self, method: str, url: str, headers: dict = None, body: bytes = None, timeout=None) -> Response:
+        self.requests += 1
+        status, response_headers, response_body = self.handler(method, url, headers or {}, body)
+
+        if isinstance(response_body, (dict, list)):
+            response_body = codec.dumps(response_body)
+            response_headers = { "Content-Type": "application/activity+json", **response_headers }
+
+        if len(response_body) > self.max_size:
+            raise TransportError(url, f"{url} is larger than {self.max_size} bytes")
+
+        return Response(url, status, response_headers, response_body)
+
+_transport = None
+_transport_lock = threading.Lock()
+
+def get_transport() -> Transport:
+    """
+    Returns the transport used for all outbound requests. A
+    `RequestsTransport` is created on first use.
+    """
+    global _transport
+
+    if _transport is None:
+        with _transport_lock:
+            if _transport is None:
+                _transport = RequestsTransport()
+
+    return _transport
+
+def set_transport(transport: Transport) -> None:
+    """
+    Use `transport` for all outbound requests, for example a
+    `RequestsTransport` with other limits or a `LocalTransport` in tests.
+    """
+    global _transport
+    _transport = transport
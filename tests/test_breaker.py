@@ -0,0 +1,75 @@
+import pytest
+
+from activity_tools import breaker
+from activity_tools.breaker import CircuitBreaker
+
+HOST = "remote.example"
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = [1000.0]
+    monkeypatch.setattr(breaker.time, "monotonic", lambda: clock[0])
+    return clock
+
+def open_breaker(clock):
+    circuit_breaker = CircuitBreaker(threshold=3, reset_timeout=60)
+
+    for _ in range(3):
+        assert circuit_breaker.allow(HOST)
+        circuit_breaker.failure(HOST)
+
+    return circuit_breaker
+
+def test_opens_after_threshold_failures(clock):
+    circuit_breaker = open_breaker(clock)
+
+    assert circuit_breaker.is_open(HOST)
+    assert not circuit_breaker.allow(HOST)
+    assert circuit_breaker.allow("other.example")
+
+def test_success_resets_the_failure_count(clock):
+    circuit_breaker = CircuitBreaker(threshold=3, reset_timeout=60)
+
+    circuit_breaker.failure(HOST)
+    circuit_breaker.failure(HOST)
+    circuit_breaker.success(HOST)
+    circuit_breaker.failure(HOST)
+
+    assert circuit_breaker.allow(HOST)
+
+def test_one_trial_after_reset_timeout(clock):
+    circuit_breaker = open_breaker(clock)
+
+    clock[0] += 59
+    assert not circuit_breaker.allow(HOST)
+
+    clock[0] += 1
+    assert circuit_breaker.allow(HOST)
+    assert not circuit_breaker.allow(HOST)
+
+def test_trial_success_closes(clock):
+    circuit_breaker = open_breaker(clock)
+
+    clock[0] += 60
+    assert circuit_breaker.allow(HOST)
+    circuit_breaker.success(HOST)
+
+    assert not circuit_breaker.is_open(HOST)
+    assert circuit_breaker.allow(HOST)
+    assert circuit_breaker.allow(HOST)
+
+def test_trial_failure_reopens(clock):
+    circuit_breaker = open_breaker(clock)
+
+    clock[0] += 60
+    assert circuit_breaker.allow(HOST)
+    circuit_breaker.failure(HOST)
+
+    assert circuit_breaker.is_open(HOST)
+    assert not circuit_breaker.allow(HOST)
+
+    # The timeout starts again from the failed trial
+    clock[0] += 59
+    assert not circuit_breaker.allow(HOST)
+    clock[0] += 1
+    assert circuit_breaker.allow(HOST)
@@ -0,0 +1,65 @@
+from importlib.util import find_spec
+
+import pytest
+
+from activity_tools import codec
+from activity_tools.codec import JSONLimitError
+
+@pytest.fixture(params=[name for name in codec.BACKENDS if find_spec(name)])
+def backend(request):
+    codec.set_backend(request.param)
+    yield request.param
+    codec.set_backend(None)
+
+def test_round_trip(backend):
+    document = { "id": "https://example.com/notes/1", "content": "héllo / wörld", "tag": [1, 2.5, None, True] }
+
+    data = codec.dumps(document)
+
+    assert isinstance(data, bytes)
+    assert codec.loads(data) == document
+    assert codec.loads(data.decode("utf-8")) == document
+
+def test_size_limit(backend):
+    data = codec.dumps({ "content": "x" * 100 })
+
+    with pytest.raises(JSONLimitError):
+        codec.loads(data, max_size=len(data) - 1)
+
+    assert codec.loads(data, max_size=len(data)) == { "content": "x" * 100 }
+    assert codec.loads(data, max_size=None) == { "content": "x" * 100 }
+
+def test_depth_limit(backend):
+    assert codec.loads("[" * 10 + "]" * 10, max_depth=10)
+
+    with pytest.raises(JSONLimitError):
+        codec.loads("[" * 11 + "]" * 11, max_depth=10)
+
+    with pytest.raises(JSONLimitError):
+        codec.loads(b'{"a":' * 11 + b"1" + b"}" * 11, max_depth=10)
+
+def test_depth_limit_is_always_applied(backend):
+    # Deep enough to crash some orjson versions if it was parsed
+    with pytest.raises(JSONLimitError):
+        codec.loads("[" * 100000 + "]" * 100000, max_size=None)
+
+def test_brackets_in_strings_do_not_count(backend):
+    string = '[[[[[[[[[[{{{{{{{{{{ \\" [[[[[[[[[['
+
+    value = '[[[[[[[[[[{{{{{{{{{{ " [[[[[[[[[['
+
+    assert codec.loads(f'["{string}", ["{string}"]]', max_depth=2) == [value, [value]]
+
+    with pytest.raises(JSONLimitError):
+        codec.loads(f'["{string}", [["{string}"]]]', max_depth=2)
+
+def test_limit_errors_are_value_errors(backend):
+    with pytest.raises(ValueError):
+        codec.loads(b"[]", max_size=1)
+
+    with pytest.raises(ValueError):
+        codec.loads(b"{not json")
+
+def test_unknown_backend():
+    with pytest.raises(Exception):
+        codec.set_backend("simplejson2")
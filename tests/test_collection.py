@@ -0,0 +1,56 @@
+import json
+
+from activity_tools.collection import OrderedCollection
+
+ID = "https://example.com/users/bob/outbox"
+
+def fetch(max_id=None, min_id=None, limit=20):
+    # Items 1 to 5, newest first
+    cursors = range(5, 0, -1)
+
+    if max_id is not None:
+        cursors = [c for c in cursors if c < int(max_id)]
+    if min_id is not None:
+        cursors = [c for c in cursors if c > int(min_id)][-limit:]
+
+    return [(c, f"item {c}") for c in list(cursors)[:limit]]
+
+def test_first_page_has_next_but_no_prev():
+    page = OrderedCollection(ID, fetch, page_size=2).page()
+
+    assert page["orderedItems"] == ["item 5", "item 4"]
+    assert page["next"] == f"{ID}?page=true&max_id=4"
+    assert "prev" not in page
+
+def test_middle_page_links_both_ways():
+    page = OrderedCollection(ID, fetch, page_size=2).page(max_id=4)
+
+    assert page["orderedItems"] == ["item 3", "item 2"]
+    assert page["next"] == f"{ID}?page=true&max_id=2"
+    assert page["prev"] == f"{ID}?page=true&min_id=3"
+
+def test_last_page_has_no_next():
+    page = OrderedCollection(ID, fetch, page_size=2).page(max_id=2)
+
+    assert page["orderedItems"] == ["item 1"]
+    assert "next" not in page
+    assert page["prev"] == f"{ID}?page=true&min_id=1"
+
+def test_min_id_page_always_has_next():
+    page = OrderedCollection(ID, fetch, page_size=20).page(min_id=3)
+
+    assert page["orderedItems"] == ["item 5", "item 4"]
+    assert page["next"] == f"{ID}?page=true&max_id=4"
+    assert page["prev"] == f"{ID}?page=true&min_id=5"
+
+def test_empty_page_has_no_links():
+    page = OrderedCollection(ID, fetch, page_size=2).page(max_id=1)
+
+    assert page["orderedItems"] == []
+    assert "next" not in page and "prev" not in page
+
+def test_stream_page_matches_page():
+    collection = OrderedCollection(ID, fetch, page_size=2)
+
+    for cursors in ({}, { "max_id": 4 }, { "max_id": 2 }, { "min_id": 3 }, { "max_id": 1 }):
+        assert json.loads(b"".join(collection.stream_page(**cursors))) == collection.page(**cursors)
@@ -0,0 +1,56 @@
+from activity_tools import codec
+from activity_tools.dedup import DuplicateFilter
+from activity_tools.headers import Signer, verify_request
+
+ALICE = "https://alice.example/users/alice"
+MALLORY = "https://evil.example/users/mallory"
+INBOX = "https://example.com/users/bob/inbox"
+
+def test_activity_ids_are_per_actor():
+    duplicates = DuplicateFilter()
+    activity = { "id": f"{ALICE}/statuses/1/activity", "type": "Create", "actor": ALICE }
+
+    duplicates.record({ **activity, "actor": MALLORY })
+    assert not duplicates.is_duplicate(activity)
+
+    duplicates.record(activity)
+    assert duplicates.is_duplicate(activity)
+    assert duplicates.is_duplicate({ **activity, "actor": { "id": ALICE } })
+
+def test_signature_is_a_duplicate():
+    duplicates = DuplicateFilter()
+    headers = [("Signature", 'keyId="k",signature="abc"')]
+
+    duplicates.record({ "type": "Create" }, headers)
+    assert duplicates.is_duplicate({ "type": "Update" }, headers)
+
+def test_verify_request_does_not_record(tmp_path):
+    from activity_tools.crypto import Ed25519Key
+    from activity_tools.keys import key_store
+    from activity_tools.transport import LocalTransport, set_transport
+
+    key = Ed25519Key(str(tmp_path / "key.pem"))
+    document = {
+        "id": ALICE,
+        "type": "Person",
+        "inbox": f"{ALICE}/inbox",
+        "publicKey": { "id": f"{ALICE}#main-key", "owner": ALICE, "publicKeyPem": key.public_key.decode() },
+    }
+
+    key_store.cache.clear()
+    set_transport(LocalTransport(lambda method, url, headers, body: (200, {}, document)))
+
+    try:
+        duplicates = DuplicateFilter()
+        body, signed = Signer(key, f"{ALICE}#main-key").sign(INBOX, { "id": f"{ALICE}#follows/1", "type": "Follow", "actor": ALICE })
+        signed = list(signed.items())
+
+        # The first attempt is verified but its handler fails, so it is not recorded
+        assert verify_request(body, signed, INBOX, duplicates=duplicates) is not None
+        assert verify_request(body, signed, INBOX, duplicates=duplicates) is not None
+
+        duplicates.record(codec.loads(body), signed)
+        assert verify_request(body, signed, INBOX, duplicates=duplicates) is None
+    finally:
+        set_transport(None)
+        key_store.cache.clear()
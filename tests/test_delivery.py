@@ -0,0 +1,122 @@
+import time
+import threading
+
+import pytest
+
+from activity_tools.crypto import Ed25519Key
+from activity_tools.delivery import Delivery, collapse_inboxes
+from activity_tools.headers import Signer
+from activity_tools.transport import LocalTransport, set_transport
+
+ACTIVITY = { "id": "https://example.com/users/foo#create/1", "type": "Create", "actor": "https://example.com/users/foo" }
+
+class Inboxes:
+    """
+    Records the posts, and how many are in flight in total and per host.
+    """
+
+    def __init__(self, delay=0, statuses=None):
+        self.delay = delay
+        self.statuses = statuses or {}
+        self.posts = []
+        self.completed = []
+        self.in_flight = {}
+        self.max_in_flight = {}
+        self.max_total = 0
+        self._lock = threading.Lock()
+
+    def __call__(self, method, url, headers, body):
+        host = url.split("/")[2]
+
+        with self._lock:
+            self.posts.append((url, headers, body))
+            self.in_flight[host] = self.in_flight.get(host, 0) + 1
+            self.max_in_flight[host] = max(self.max_in_flight.get(host, 0), self.in_flight[host])
+            self.max_total = max(self.max_total, sum(self.in_flight.values()))
+
+        time.sleep(self.delay)
+
+        with self._lock:
+            self.in_flight[host] -= 1
+            self.completed.append(host)
+
+        return self.statuses.get(url, 202), {}, b""
+
+@pytest.fixture
+def signer(tmp_path):
+    return Signer(Ed25519Key(str(tmp_path / "key.pem")), "https://example.com/users/foo#main-key")
+
+@pytest.fixture
+def inboxes():
+    inboxes = Inboxes()
+    set_transport(LocalTransport(inboxes))
+    yield inboxes
+    set_transport(None)
+
+def actor(host, name, shared=True):
+    document = { "id": f"https://{host}/users/{name}", "inbox": f"https://{host}/users/{name}/inbox" }
+    if shared:
+        document["endpoints"] = { "sharedInbox": f"https://{host}/inbox" }
+    return document
+
+def test_collapse_inboxes():
+    alice, bob, carol = actor("a.example", "alice"), actor("a.example", "bob"), actor("b.example", "carol", shared=False)
+
+    assert collapse_inboxes([alice, bob, carol, "https://c.example/inbox"]) == {
+        "https://a.example/inbox": [alice, bob],
+        "https://b.example/users/carol/inbox": [carol],
+        "https://c.example/inbox": ["https://c.example/inbox"],
+    }
+
+def test_deliver_results_per_inbox(signer, inboxes):
+    alice, bob = actor("shared.example", "alice"), actor("shared.example", "bob")
+    carol = actor("gone.example", "carol", shared=False)
+    inboxes.statuses[carol["inbox"]] = 410
+
+    delivery = Delivery(signer)
+    results = { result.inbox: result for result in delivery.deliver_sync(ACTIVITY, [alice, bob, carol]) }
+    delivery.close()
+
+    assert len(inboxes.posts) == 2
+    assert results["https://shared.example/inbox"].ok
+    assert results["https://shared.example/inbox"].recipients == [alice, bob]
+    assert not results[carol["inbox"]].ok
+    assert results[carol["inbox"]].status == 410
+    assert results[carol["inbox"]].recipients == [carol]
+
+    # One body, signed for each inbox
+    assert len({ body for _, _, body in inboxes.posts }) == 1
+    assert all("Signature" in headers for _, headers, _ in inboxes.posts)
+
+def test_deliver_limits_concurrency(signer, inboxes):
+    inboxes.delay = 0.05
+    busy = [f"https://busy.example/users/{i}/inbox" for i in range(40)]
+    others = [f"https://other{i}.example/inbox" for i in range(6)]
+
+    delivery = Delivery(signer, concurrency=8, per_host=2)
+    results = delivery.deliver_sync(ACTIVITY, busy + others)
+    delivery.close()
+
+    assert all(result.ok for result in results)
+    assert inboxes.max_in_flight["busy.example"] == 2
+    assert inboxes.max_total <= 8
+
+    # A busy host does not hold global slots while it waits, the other
+    # hosts are served right away
+    assert set(inboxes.completed[:8]) >= { f"other{i}.example" for i in range(6) }
+
+def test_signing_errors_do_not_open_the_circuit(tmp_path, inboxes):
+    from activity_tools.breaker import circuit_breaker
+
+    signer = Signer(Ed25519Key(str(tmp_path / "key.pem")))
+    inbox = "https://unsigned.example/inbox"
+
+    delivery = Delivery(signer)
+    for _ in range(circuit_breaker.threshold + 1):
+        [result] = delivery.deliver_sync(ACTIVITY, [inbox])
+    delivery.close()
+
+    assert not result.ok
+    assert "sign" in result.error
+    assert not inboxes.posts
+    assert not circuit_breaker.is_open("unsigned.example")
@@ -0,0 +1,45 @@
+import pytest
+
+from activity_tools.followers import SQLiteFollowerStore
+
+OWNER = "https://example.com/users/bob"
+
+@pytest.fixture
+def followers(tmp_path):
+    store = SQLiteFollowerStore(str(tmp_path / "followers.db"))
+    yield store
+    store.close()
+
+def test_followers_sharing_an_inbox_are_one_target(followers):
+    followers.add(OWNER, "https://a.example/users/1", "https://a.example/users/1/inbox", "https://a.example/inbox")
+    followers.add(OWNER, "https://a.example/users/2", "https://a.example/users/2/inbox", "https://a.example/inbox")
+    followers.add(OWNER, "https://b.example/users/3", "https://b.example/users/3/inbox")
+
+    assert sorted(followers.delivery_targets(OWNER)) == ["https://a.example/inbox", "https://b.example/users/3/inbox"]
+    assert followers.count(OWNER) == 3
+
+    followers.remove(OWNER, "https://a.example/users/1")
+    assert "https://a.example/inbox" in followers.delivery_targets(OWNER)
+
+    followers.remove(OWNER, "https://a.example/users/2")
+    assert followers.delivery_targets(OWNER) == ["https://b.example/users/3/inbox"]
+
+    followers.remove(OWNER, "https://a.example/users/2")
+    assert followers.count(OWNER) == 1
+
+def test_moving_between_inbox_and_shared_inbox_keeps_targets_counted(followers):
+    followers.add(OWNER, "https://a.example/users/1", "https://a.example/users/1/inbox", "https://a.example/inbox")
+    followers.add(OWNER, "https://a.example/users/2", "https://a.example/users/2/inbox", "https://a.example/inbox")
+
+    # The first follower no longer advertises a sharedInbox
+    followers.add(OWNER, "https://a.example/users/1", "https://a.example/users/1/inbox")
+    assert sorted(followers.delivery_targets(OWNER)) == ["https://a.example/inbox", "https://a.example/users/1/inbox"]
+
+    # And the second one moves back to its own inbox too
+    followers.add(OWNER, "https://a.example/users/2", "https://a.example/users/2/inbox")
+    assert sorted(followers.delivery_targets(OWNER)) == ["https://a.example/users/1/inbox", "https://a.example/users/2/inbox"]
+
+    followers.add(OWNER, "https://a.example/users/1", "https://a.example/users/1/inbox", "https://a.example/inbox")
+    followers.remove(OWNER, "https://a.example/users/2")
+    assert followers.delivery_targets(OWNER) == ["https://a.example/inbox"]
+    assert followers.count(OWNER) == 1
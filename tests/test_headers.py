@@ -0,0 +1,82 @@
+import json
+import base64
+import hashlib
+
+import pytest
+
+from activity_tools import headers
+from activity_tools.crypto import Ed25519Key
+from activity_tools.headers import Signer, make_signature
+
+INBOX = "https://example.com/users/bob/inbox"
+ACTOR = "https://remote.example/users/alice"
+
+@pytest.fixture
+def key(tmp_path):
+    return Ed25519Key(str(tmp_path / "key.pem"))
+
+def test_make_signature_digests_json_dumps(key, monkeypatch):
+    monkeypatch.setattr(headers, "_default_signer", Signer(key))
+    message = { "id": f"{ACTOR}#follows/1", "type": "Follow", "actor": ACTOR, "object": "https://example.com/users/bob" }
+
+    signed = make_signature(INBOX, message, f"{ACTOR}#main-key")
+
+    digest = base64.b64encode(hashlib.sha256(json.dumps(message).encode("utf-8")).digest()).decode()
+    assert signed["Digest"] == f"SHA-256={digest}"
+
+def test_verify_request_without_signed_header(key):
+    import asyncio
+    from activity_tools.headers import verify_request, verify_request_async
+
+    body, signed = Signer(key, f"{ACTOR}#main-key").sign(INBOX, { "type": "Delete", "actor": ACTOR })
+    without_host = [(name, value) for name, value in signed.items() if name.lower() != "host"]
+
+    async def stream():
+        yield body
+
+    assert verify_request(body, without_host, "/users/bob/inbox") is None
+    assert asyncio.run(verify_request_async(stream(), without_host, "/users/bob/inbox")) is None
+
+def test_verify_signatures_with_invalid_body(key):
+    from activity_tools.headers import verify_signatures
+
+    body, signed = Signer(key, f"{ACTOR}#main-key").sign(INBOX, { "type": "Delete", "actor": ACTOR })
+
+    assert verify_signatures([(list(signed.items()), b"{not json", "/users/bob/inbox")]) == [False]
+
+@pytest.fixture
+def actor(key):
+    from activity_tools.keys import key_store
+    from activity_tools.transport import LocalTransport, set_transport
+
+    document = {
+        "id": ACTOR,
+        "type": "Person",
+        "inbox": f"{ACTOR}/inbox",
+        "publicKey": { "id": f"{ACTOR}#main-key", "owner": ACTOR, "publicKeyPem": key.public_key.decode() },
+    }
+
+    key_store.cache.clear()
+    set_transport(LocalTransport(lambda method, url, headers, body: (200, {}, document) if url == ACTOR else (404, {}, b"")))
+    yield document
+    set_transport(None)
+    key_store.cache.clear()
+
+def test_verify_signatures_checks_the_digest_of_raw_bodies(key, actor):
+    from concurrent.futures import ProcessPoolExecutor
+    from activity_tools.headers import verify_signatures
+
+    signer = Signer(key, f"{ACTOR}#main-key")
+    body, signed = signer.sign(INBOX, { "id": f"{ACTOR}#follows/1", "type": "Follow", "actor": ACTOR, "object": INBOX })
+    other = json.dumps({ "id": f"{ACTOR}#delete", "type": "Delete", "actor": ACTOR, "object": ACTOR }).encode("utf-8")
+    signed = list(signed.items())
+
+    with ProcessPoolExecutor(max_workers=1) as executor:
+        results = verify_signatures([
+            (signed, body, "/users/bob/inbox"),
+            (signed, other, "/users/bob/inbox"),
+            (signed, body, "/users/bob/inbox"),
+        ], executor=executor)
+
+    assert results == [True, False, True]
+    assert verify_signatures([(signed, body, "/users/bob/inbox")], max_size=len(body) - 1) == [False]
@@ -0,0 +1,26 @@
+import os
+import sys
+import subprocess
+
+import pytest
+
+SRC = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src")
+
+HEAVY = ("requests", "cryptography", "multiprocessing", "asyncio")
+""" Packages that must only be imported on first use, see benchmarks/import_time.py """
+
+@pytest.mark.parametrize("module", [
+    "activity_tools.misc",
+    "activity_tools.objects",
+    "activity_tools.inbox",
+    "activity_tools.crypto",
+    "activity_tools.headers",
+])
+def test_import_does_not_load_heavy_packages(module):
+    code = (
+        f"import sys; sys.path.insert(0, {SRC!r}); import {module}; "
+        f"print(','.join(m for m in {HEAVY!r} if m in sys.modules))"
+    )
+    result = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True)
+
+    assert result.stdout.strip() == ""
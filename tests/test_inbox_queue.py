@@ -0,0 +1,59 @@
+import asyncio
+
+from activity_tools.inbox_queue import InboxQueue
+
+HEADERS = [("Signature", 'keyId="https://remote.example/users/alice#main-key"'), ("Digest", "SHA-256=abc")]
+
+def read(queue, chunks, headers=HEADERS):
+    read = []
+
+    async def stream():
+        for chunk in chunks:
+            read.append(chunk)
+            yield chunk
+
+    return asyncio.run(queue.accept_stream(stream(), headers, "/users/bob/inbox")), len(read)
+
+def test_accept_stream(tmp_path):
+    queue = InboxQueue(str(tmp_path / "inbox.db"), max_body_size=10)
+
+    assert read(queue, [b"12345", b"12345"]) == (True, 2)
+    assert queue.claim().body == b"1234512345"
+
+def test_accept_stream_stops_reading_large_bodies(tmp_path):
+    queue = InboxQueue(str(tmp_path / "inbox.db"), max_body_size=10)
+
+    assert read(queue, [b"123456", b"123456", b"123456"]) == (False, 2)
+    assert read(queue, [b"12345"], headers=HEADERS[:1]) == (False, 0)
+    assert queue.depth() == 0
+
+def test_claim_leases_and_retries(tmp_path):
+    queue = InboxQueue(str(tmp_path / "inbox.db"), lease=60, retry_delay=0, max_attempts=2)
+    queue.enqueue(b"{}", HEADERS, "/users/bob/inbox")
+
+    request = queue.claim()
+    assert request.attempts == 1
+    assert request.headers == HEADERS
+    assert queue.claim() is None
+
+    queue.fail(request)
+    request = queue.claim()
+    assert request.attempts == 2
+
+    # Dead after max_attempts
+    queue.fail(request)
+    assert queue.claim() is None
+    assert queue.depth() == 0
+
+def test_process_completes_or_fails(tmp_path):
+    queue = InboxQueue(str(tmp_path / "inbox.db"), retry_delay=0)
+    queue.enqueue(b"{}", HEADERS, "/users/bob/inbox")
+
+    def fail(request):
+        raise Exception("dispatch failed")
+
+    assert queue.process(fail)
+    assert queue.depth() == 1
+    assert queue.process(lambda request: None)
+    assert queue.depth() == 0
+    assert not queue.process(lambda request: None)
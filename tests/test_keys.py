@@ -0,0 +1,93 @@
+import pytest
+
+from activity_tools.crypto import Ed25519Key
+from activity_tools.headers import Signer, verify_request
+from activity_tools.keys import key_store
+from activity_tools.transport import LocalTransport, set_transport
+
+VICTIM = "https://victim.example/users/alice"
+EVIL = "https://evil.example"
+INBOX = "https://example.com/users/bob/inbox"
+
+@pytest.fixture
+def keys(tmp_path):
+    return Ed25519Key(str(tmp_path / "victim.pem")), Ed25519Key(str(tmp_path / "evil.pem"))
+
+@pytest.fixture
+def documents():
+    documents = {}
+
+    def handler(method, url, headers, body):
+        if url in documents:
+            return 200, {}, documents[url]
+        return 404, {}, b""
+
+    key_store.cache.clear()
+    set_transport(LocalTransport(handler))
+    yield documents
+    set_transport(None)
+    key_store.cache.clear()
+
+def actor(id, key, key_id=None):
+    return {
+        "id": id,
+        "type": "Person",
+        "inbox": f"{id}/inbox",
+        "publicKey": { "id": key_id or f"{id}#main-key", "owner": id, "publicKeyPem": key.public_key.decode() },
+    }
+
+def delete(actor_id, signer):
+    body, headers = signer.sign(INBOX, { "id": f"{actor_id}#delete", "type": "Delete", "actor": actor_id, "object": actor_id })
+    return verify_request(body, list(headers.items()), INBOX)
+
+def test_standalone_key_document(keys, documents):
+    victim_key, _ = keys
+    documents[VICTIM] = actor(VICTIM, victim_key, f"{VICTIM}/key")
+    documents[f"{VICTIM}/key"] = { "id": f"{VICTIM}/key", "owner": VICTIM, "publicKeyPem": victim_key.public_key.decode() }
+
+    assert delete(VICTIM, Signer(victim_key, f"{VICTIM}/key")) is not None
+
+def test_key_document_with_forged_owner(keys, documents):
+    victim_key, evil_key = keys
+    documents[VICTIM] = actor(VICTIM, victim_key)
+    documents[f"{EVIL}/key"] = { "id": f"{EVIL}/key", "owner": VICTIM, "publicKeyPem": evil_key.public_key.decode() }
+
+    assert delete(VICTIM, Signer(evil_key, f"{EVIL}/key")) is None
+
+def test_key_document_with_owner_that_does_not_list_it(keys, documents):
+    victim_key, evil_key = keys
+    documents[VICTIM] = actor(VICTIM, victim_key)
+    documents[f"{VICTIM}/key"] = { "id": f"{VICTIM}/key", "owner": VICTIM, "publicKeyPem": evil_key.public_key.decode() }
+
+    assert delete(VICTIM, Signer(evil_key, f"{VICTIM}/key")) is None
+
+def test_actor_document_served_for_another_url(keys, documents):
+    victim_key, evil_key = keys
+    documents[f"{EVIL}/users/mallory"] = actor(VICTIM, evil_key, f"{EVIL}/users/mallory#main-key")
+
+    assert delete(VICTIM, Signer(evil_key, f"{EVIL}/users/mallory#main-key")) is None
+
+def test_actor_document_with_key_of_another_actor(keys, documents):
+    victim_key, evil_key = keys
+    mallory = f"{EVIL}/users/mallory"
+    documents[VICTIM] = actor(VICTIM, victim_key)
+    documents[mallory] = actor(mallory, evil_key)
+    documents[mallory]["publicKey"] = [
+        documents[mallory]["publicKey"],
+        { "id": f"{VICTIM}#main-key", "owner": mallory, "publicKeyPem": evil_key.public_key.decode() },
+    ]
+
+    assert delete(mallory, Signer(evil_key, f"{mallory}#main-key")) is not None
+    assert key_store.cache.get(f"{VICTIM}#main-key") is None
+    assert delete(VICTIM, Signer(evil_key, f"{VICTIM}#main-key")) is None
+
+def test_actor_document_caches_its_other_keys(keys, documents):
+    victim_key, evil_key = keys
+    documents[VICTIM] = actor(VICTIM, victim_key)
+    documents[VICTIM]["publicKey"] = [
+        documents[VICTIM]["publicKey"],
+        { "id": f"{VICTIM}#new-key", "owner": VICTIM, "publicKeyPem": evil_key.public_key.decode() },
+    ]
+
+    assert delete(VICTIM, Signer(victim_key, f"{VICTIM}#main-key")) is not None
+    assert key_store.cache.get(f"{VICTIM}#new-key") is not None
@@ -0,0 +1,44 @@
+import pytest
+
+from activity_tools.crypto import Ed25519Key, multibase_public_key
+from activity_tools.objects import Actor, actor_cache
+from activity_tools.transport import LocalTransport, set_transport
+
+ACTOR = "https://remote.example/users/alice"
+
+@pytest.fixture
+def multikey_actor(tmp_path):
+    key = Ed25519Key(str(tmp_path / "key.pem"))
+    document = {
+        "id": ACTOR,
+        "type": "Person",
+        "inbox": f"{ACTOR}/inbox",
+        "preferredUsername": "alice",
+        "assertionMethod": [{
+            "id": f"{ACTOR}#ed25519-key",
+            "type": "Multikey",
+            "controller": ACTOR,
+            "publicKeyMultibase": multibase_public_key(key.key.public_key()),
+        }],
+    }
+
+    actor_cache.clear()
+    set_transport(LocalTransport(lambda method, url, headers, body: (200, {}, document)))
+    yield document
+    set_transport(None)
+    actor_cache.clear()
+
+def test_fetch_actor_with_only_multikeys(multikey_actor):
+    actor = Actor.fetch(ACTOR)
+
+    assert actor.public_key_pem is None
+    assert actor.get_public_key() is None
+    assert actor.assertion_method == multikey_actor["assertionMethod"]
+
+def test_actor_fields_can_be_added():
+    actor = Actor()
+    actor.create("example.com", "bob", b"-----BEGIN PUBLIC KEY-----")
+    actor.endpoints = { "sharedInbox": "https://example.com/inbox" }
+    actor.featured = "https://example.com/users/bob/featured"
+
+    assert actor.endpoints["sharedInbox"] == "https://example.com/inbox"
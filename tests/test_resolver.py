@@ -0,0 +1,73 @@
+import time
+import threading
+from urllib.parse import urlparse, parse_qs
+
+import pytest
+
+from activity_tools.resolver import WebFingerResolver, parse_handle
+from activity_tools.transport import LocalTransport, set_transport
+
+class WebFinger:
+    """
+    Serves WebFinger documents for every handle, except on gone.example.
+    """
+
+    def __init__(self, delay=0):
+        self.delay = delay
+        self.requests = 0
+        self.completed = []
+        self._lock = threading.Lock()
+
+    def __call__(self, method, url, headers, body):
+        resource = parse_qs(urlparse(url).query)["resource"][0]
+        user, host = resource[len("acct:"):].split("@")
+
+        with self._lock:
+            self.requests += 1
+
+        time.sleep(self.delay)
+
+        with self._lock:
+            self.completed.append(host)
+
+        if host == "gone.example":
+            return 404, {}, b""
+
+        return 200, {}, {
+            "subject": resource,
+            "links": [{ "rel": "self", "type": "application/activity+json", "href": f"https://{host}/users/{user}" }],
+        }
+
+@pytest.fixture
+def webfinger():
+    webfinger = WebFinger()
+    set_transport(LocalTransport(webfinger))
+    yield webfinger
+    set_transport(None)
+
+def test_parse_handle():
+    assert parse_handle("@foo@Example.com") == "acct:foo@example.com"
+    assert parse_handle("acct:foo@example.com") == "acct:foo@example.com"
+
+    with pytest.raises(Exception):
+        parse_handle("https://example.com/users/foo")
+
+def test_resolve_caches_found_and_missing_handles(webfinger):
+    resolver = WebFingerResolver()
+
+    assert resolver.resolve("@foo@a.example") == "https://a.example/users/foo"
+    assert resolver.resolve("foo@a.example") == "https://a.example/users/foo"
+    assert resolver.resolve("@foo@gone.example") is None
+    assert resolver.resolve("@foo@gone.example") is None
+    assert webfinger.requests == 2
+
+def test_resolve_many_does_not_starve_other_hosts(webfinger):
+    webfinger.delay = 0.03
+    busy = [f"@user{i}@busy.example" for i in range(20)]
+    others = [f"@user@other{i}.example" for i in range(4)]
+
+    resolved = WebFingerResolver(concurrency=4, per_host=1).resolve_many_sync(busy + others + ["not a handle"])
+
+    assert resolved["not a handle"] is None
+    assert resolved["@user@other0.example"] == "https://other0.example/users/user"
+    assert set(webfinger.completed[:8]) >= { f"other{i}.example" for i in range(4) }
@@ -0,0 +1,33 @@
+import pytest
+import requests
+
+from activity_tools.breaker import FetchError
+from activity_tools.objects import fetch_document
+from activity_tools.resolver import WebFingerResolver
+from activity_tools.transport import RequestsTransport, set_transport
+
+class RecordingSession:
+    def __init__(self):
+        self.timeouts = []
+
+    def request(self, method, url, timeout=None, **kwargs):
+        self.timeouts.append(timeout)
+        raise requests.ConnectionError("refused")
+
+@pytest.fixture
+def session():
+    transport = RequestsTransport(timeout=(1, 2))
+    transport._session = RecordingSession()
+    set_transport(transport)
+    yield transport._session
+    set_transport(None)
+
+def test_fetch_uses_the_transport_timeout(session):
+    with pytest.raises(FetchError):
+        fetch_document("https://timeout-fetch.example/users/alice")
+
+    assert session.timeouts == [(1, 2)]
+
+def test_webfinger_uses_the_transport_timeout(session):
+    assert WebFingerResolver().resolve("@alice@timeout-webfinger.example") is None
+    assert session.timeouts == [(1, 2)]